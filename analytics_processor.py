@@ -1,60 +1,184 @@
 # analytics_processor.py
 
-from collections import Counter
-from datetime import datetime
-from typing import List, Dict, Tuple, Any
+import numpy as np
+import pandas as pd
+from functools import cached_property
+from types import MappingProxyType
+from typing import List, Dict, Tuple, Any, Union
+from logging_setup import logger
+
+# Etiquetas fijas para las 24 horas del día
+HOUR_LABELS = tuple(f"{h:02d}:00" for h in range(24))
+
+_ZERO_HOURS = (0,) * 24
+
+NS_PER_HOUR = 3_600_000_000_000
+
+# KPIs devueltos cuando no hay eventos (solo lectura; kpis devuelve copias)
+_EMPTY_KPIS = MappingProxyType({
+    "total_events": 0,
+    "event_counts": {},
+    "most_frequent_event": ("N/A", 0),
+    "peak_hour": ("N/A", 0)
+})
+
+# Campos de los KPIs cuando los datos no tienen el formato esperado
+_FORMAT_ERROR_KPIS = MappingProxyType({
+    "most_frequent_event": ("Error de formato", 0),
+    "peak_hour": ("Error de formato", 0)
+})
 
 class AnalyticsProcessor:
     """
     Procesa una lista de eventos históricos para generar estadísticas y
     datos estructurados para visualización.
     """
-    def __init__(self, events_data: List[Dict[str, Any]]):
+    def __init__(self, events_data: Union[List[Dict[str, Any]], pd.DataFrame, Any]):
         """
         Inicializa el procesador con los datos crudos de la base de datos.
 
         Args:
-            events_data (List[Dict[str, Any]]): Una lista de diccionarios, donde cada 
-                                               diccionario representa un evento de comportamiento.
+            events_data: Los eventos de comportamiento, ya sea como lista de diccionarios
+                         (una fila por evento), como DataFrame de pandas, como diccionario
+                         de columnas o como tabla columnar con 'to_pandas()' (p. ej. Arrow).
         """
         self.events = events_data
-        self.total_events = len(events_data) if events_data else 0
+        columns = self._to_columnar(events_data)
+        self.total_events = len(columns)
+
+        # Las fechas se parsean una sola vez (vectorizado) a epoch en nanosegundos y
+        # se comparten entre el cálculo de KPIs y el gráfico por hora.
+        self._timestamps_ns, self._invalid_timestamps = self._parse_event_timestamps(columns)
+        self._hours = self._hours_from_timestamps(self._timestamps_ns)
+        self._event_types = columns['tipo_evento'].dropna().to_numpy(dtype=object) if 'tipo_evento' in columns else np.empty(0, dtype=object)
+
+    @classmethod
+    def from_arrays(cls, timestamps_ns: np.ndarray, event_types: np.ndarray,
+                    invalid_timestamps: int = 0) -> 'AnalyticsProcessor':
+        """
+        Construye el procesador directamente a partir de columnas ya materializadas,
+        evitando la lista de diccionarios y el parseo de fechas.
+
+        Args:
+            timestamps_ns (np.ndarray): Marcas de tiempo (hora local) como epoch int64 en nanosegundos.
+            event_types (np.ndarray): Tipo de evento de cada fila, alineado con 'timestamps_ns'.
+            invalid_timestamps (int): Fechas que no se pudieron interpretar al materializar las columnas.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        event_types = np.asarray(event_types, dtype=object)
+        processor = cls([])
+        processor.total_events = len(event_types)
+        processor._timestamps_ns = timestamps_ns
+        processor._hours = cls._hours_from_timestamps(timestamps_ns)
+        processor._event_types = event_types
+        processor._invalid_timestamps = invalid_timestamps
+        return processor
+
+    @classmethod
+    def from_records(cls, events: List[Dict[str, Any]]) -> 'AnalyticsProcessor':
+        """
+        Ruta rápida para la lista de diccionarios que devuelve la base de datos: las fechas
+        en texto ISO ('YYYY-MM-DD HH:MM:SS') se parsean directamente con NumPy
+        (datetime64), sin construir un DataFrame. Si algún valor no tiene ese formato se
+        recurre al constructor general.
+        """
+        if not events:
+            return cls([])
+        try:
+            times = np.array([event.get('fecha_hora') for event in events], dtype='datetime64[s]')
+        except (ValueError, TypeError):
+            return cls(events)
+        times = times[~np.isnat(times)]
+        event_types = np.array([t for t in (event.get('tipo_evento') for event in events) if t is not None], dtype=object)
+        processor = cls.from_arrays(times.astype('datetime64[ns]').view(np.int64), event_types)
+        processor.events = events
+        processor.total_events = len(events)
+        return processor
+
+    @staticmethod
+    def _to_columnar(events_data: Any) -> pd.DataFrame:
+        """Normaliza cualquiera de los formatos de entrada aceptados a un DataFrame columnar."""
+        if events_data is None:
+            return pd.DataFrame()
+        if isinstance(events_data, pd.DataFrame):
+            return events_data
+        if hasattr(events_data, 'to_pandas'):
+            return events_data.to_pandas()
+        if isinstance(events_data, dict):
+            return pd.DataFrame(events_data)
+        return pd.DataFrame.from_records(events_data) if len(events_data) else pd.DataFrame()
+
+    @staticmethod
+    def _parse_event_timestamps(columns: pd.DataFrame) -> Tuple[np.ndarray, int]:
+        """
+        Convierte la columna 'fecha_hora' en epoch int64 (ns). Devuelve también cuántas
+        fechas presentes no se pudieron interpretar, para que los KPIs reporten el error
+        de formato en lugar de calcularse en silencio sobre menos filas.
+        """
+        if 'fecha_hora' not in columns:
+            return np.empty(0, dtype=np.int64), 0
+        timestamps = columns['fecha_hora'].dropna()
+        if timestamps.empty:
+            return np.empty(0, dtype=np.int64), 0
+        if not pd.api.types.is_datetime64_any_dtype(timestamps):
+            timestamps = pd.to_datetime(timestamps.astype(str), format='ISO8601', errors='coerce', cache=True)
+        valid = timestamps.dropna()
+        return valid.to_numpy(dtype='datetime64[ns]').view(np.int64), len(timestamps) - len(valid)
+
+    @staticmethod
+    def _hours_from_timestamps(timestamps_ns: np.ndarray) -> np.ndarray:
+        """Extrae la hora del día (0-23) con aritmética entera sobre el epoch en nanosegundos."""
+        return ((timestamps_ns // NS_PER_HOUR) % 24).astype(np.int8)
 
-    def calculate_kpis(self) -> Dict[str, Any]:
+    @cached_property
+    def _event_counts(self) -> Dict[str, int]:
         """
-        Calcula los Indicadores Clave de Rendimiento (KPIs) a partir de los eventos.
+        Conteo por tipo de evento, ordenado de mayor a menor frecuencia. Los empates se
+        resuelven por orden de primera aparición (como Counter.most_common): con los eventos
+        más recientes primero, gana el tipo más reciente.
+        """
+        if not self._event_types.size:
+            return {}
+        values, first_index, counts = np.unique(self._event_types.astype(str), return_index=True, return_counts=True)
+        order = np.lexsort((first_index, -counts))
+        return {str(values[i]): int(counts[i]) for i in order}
+
+    @cached_property
+    def _hour_counts(self) -> np.ndarray:
+        """Conteo de eventos para cada una de las 24 horas del día."""
+        return np.bincount(self._hours, minlength=24)[:24]
+
+    @cached_property
+    def kpis(self) -> Dict[str, Any]:
+        """
+        Indicadores Clave de Rendimiento (KPIs) de los eventos. Se calculan una sola vez
+        por instancia y se reutilizan en las consultas siguientes.
         
         Devuelve:
             Un diccionario con las estadísticas clave para mostrar en la GUI.
         """
-        if not self.events:
-            return {
-                "total_events": 0,
-                "event_counts": {},
-                "most_frequent_event": ("N/A", 0),
-                "peak_hour": ("N/A", 0)
-            }
+        if not self.total_events:
+            return {**_EMPTY_KPIS, "event_counts": {}}
 
-        # Conteo de frecuencia de cada tipo de evento
-        try:
-            event_types = [event['tipo_evento'] for event in self.events if 'tipo_evento' in event]
-            event_counts = Counter(event_types)
-            most_frequent = event_counts.most_common(1)[0] if event_counts else ("N/A", 0)
+        if self._invalid_timestamps:
+            # Manejo de error si las fechas no tienen el formato esperado
+            logger.error(f"Error al procesar fechas en los datos: {self._invalid_timestamps} "
+                         f"de {self.total_events} eventos con fecha inválida.")
+            return {"total_events": self.total_events, "event_counts": {}, **_FORMAT_ERROR_KPIS}
 
-            # Cálculo de la hora con más eventos
-            hours = [datetime.fromisoformat(event['fecha_hora']).hour for event in self.events if 'fecha_hora' in event]
-            hour_counts = Counter(hours)
-            peak_hour = hour_counts.most_common(1)[0] if hour_counts else ("N/A", 0)
+        # Conteo de frecuencia de cada tipo de evento
+        event_counts = self._event_counts
+        most_frequent = next(iter(event_counts.items())) if event_counts else ("N/A", 0)
 
-        except (ValueError, TypeError) as e:
-            # Manejo de error si las fechas no tienen el formato esperado
-            logger.error(f"Error al procesar fechas o tipos de evento en los datos: {e}")
-            return {
-                "total_events": self.total_events,
-                "event_counts": {},
-                "most_frequent_event": ("Error de formato", 0),
-                "peak_hour": ("Error de formato", 0)
-            }
+        # Cálculo de la hora con más eventos
+        if self._hours.size:
+            # Entre horas empatadas, la primera que aparece en los datos (como Counter.most_common)
+            hour_counts = self._hour_counts
+            peak_count = hour_counts.max()
+            first_peak = self._hours[np.argmax(hour_counts[self._hours] == peak_count)]
+            peak_hour = (int(first_peak), int(peak_count))
+        else:
+            peak_hour = ("N/A", 0)
 
         return {
             "total_events": self.total_events,
@@ -63,26 +187,16 @@ class AnalyticsProcessor:
             "peak_hour": peak_hour
         }
 
-    def get_bar_chart_data(self, event_counts: Dict[str, int]) -> Tuple[List[str], List[int]]:
+    def get_bar_chart_data(self) -> Tuple[List[str], List[int]]:
         """
         Prepara los datos para un gráfico de barras de frecuencia de eventos.
         
-        Args:
-            event_counts (Dict[str, int]): Diccionario con el conteo de cada evento.
-        
         Devuelve:
-            Una tupla con (lista_de_etiquetas_de_eventos, lista_de_valores_de_conteo).
+            Una tupla con (lista_de_etiquetas_de_eventos, lista_de_valores_de_conteo),
+            ordenada por frecuencia para un gráfico más legible.
         """
-        if not event_counts:
-            return [], []
-            
-        # Ordenar eventos por frecuencia para un gráfico más legible
-        sorted_events = sorted(event_counts.items(), key=lambda item: item[1], reverse=True)
-        
-        labels = [item[0] for item in sorted_events]
-        values = [item[1] for item in sorted_events]
-        
-        return labels, values
+        event_counts = self._event_counts
+        return list(event_counts.keys()), list(event_counts.values())
 
     def get_time_series_chart_data(self) -> Tuple[List[str], List[int]]:
         """
@@ -91,22 +205,45 @@ class AnalyticsProcessor:
         Devuelve:
             Una tupla con (lista_de_etiquetas_de_hora (0-23), lista_de_conteo_por_hora).
         """
-        if not self.events:
-            return [f"{h:02d}:00" for h in range(24)], [0] * 24
+        if not self.total_events:
+            return list(HOUR_LABELS), list(_ZERO_HOURS)
 
-        try:
-            hours = [datetime.fromisoformat(event['fecha_hora']).hour for event in self.events if 'fecha_hora' in event]
-            hour_counts = Counter(hours)
-        except (ValueError, TypeError) as e:
-             logger.error(f"Error al procesar timestamps para el gráfico de tiempo: {e}")
-             return [f"{h:02d}:00" for h in range(24)], [0] * 24
-            
-        # Crear una lista para las 24 horas del día, inicializada en 0
-        time_series = [0] * 24
-        for hour, count in hour_counts.items():
-            if 0 <= hour < 24:
-                time_series[hour] = count
-                
-        hour_labels = [f"{h:02d}:00" for h in range(24)]
-
-        return hour_labels, time_series
\ No newline at end of file
+        if self._invalid_timestamps:
+            logger.error(f"Error al procesar timestamps para el gráfico de tiempo: "
+                         f"{self._invalid_timestamps} fechas inválidas.")
+            return list(HOUR_LABELS), list(_ZERO_HOURS)
+
+        return list(HOUR_LABELS), self._hour_counts.tolist()
+
+class AnalyticsAccumulator:
+    """
+    Construye un AnalyticsProcessor a partir de eventos recibidos por bloques: cada bloque
+    se parsea al llegar (fechas a epoch, tipos de evento) y al final solo se concatenan
+    las columnas ya procesadas.
+    """
+    def __init__(self):
+        self._timestamps_ns: List[np.ndarray] = []
+        self._event_types: List[np.ndarray] = []
+        self.total_events = 0
+        self.invalid_timestamps = 0
+
+    def add(self, events_chunk: Union[List[Dict[str, Any]], pd.DataFrame, Any]):
+        """Procesa un bloque de eventos en cualquiera de los formatos que acepta AnalyticsProcessor."""
+        if isinstance(events_chunk, list):
+            chunk = AnalyticsProcessor.from_records(events_chunk)
+        else:
+            chunk = AnalyticsProcessor(events_chunk)
+        self._timestamps_ns.append(chunk._timestamps_ns)
+        self._event_types.append(chunk._event_types)
+        self.total_events += chunk.total_events
+        self.invalid_timestamps += chunk._invalid_timestamps
+
+    def to_processor(self) -> AnalyticsProcessor:
+        """Devuelve un AnalyticsProcessor equivalente al de todos los bloques juntos."""
+        if not self._event_types:
+            return AnalyticsProcessor([])
+        processor = AnalyticsProcessor.from_arrays(np.concatenate(self._timestamps_ns),
+                                                   np.concatenate(self._event_types),
+                                                   self.invalid_timestamps)
+        processor.total_events = self.total_events
+        return processor
@@ -2,56 +2,69 @@
 
 import cv2
 import time
+import subprocess
+import sys
+import threading
 import numpy as np
-from PyQt5.QtCore import QThread, pyqtSignal
+from typing import Optional, Tuple
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
 from logging_setup import logger
 from config_manager import ConfigManager
 import roi_autoexp
 
-class CameraThread(QThread):
+class CameraWorker(QObject):
     """
-    Hilo dedicado para la captura de frames de la cámara sin bloquear la interfaz gráfica.
-    Emite cada fotograma capturado a través de una señal.
+    Trabajador de captura que vive en un QThread propio (moveToThread).
+    Cada lectura se programa con QTimer.singleShot, de modo que el bucle de la cámara
+    corre dentro del event loop del hilo y se intercala con el resto de eventos Qt.
+
+    Los fotogramas no viajan en la señal: el trabajador guarda solo el más reciente
+    (sustituyendo al anterior si aún no se ha consumido) y avisa con 'frame_ready'.
+    Así, si el procesamiento en la GUI es más lento que la cámara, no se acumulan
+    frames atrasados en la cola de eventos de Qt.
     """
-    # Señal que emite un fotograma capturado como un array de numpy
-    update_frame = pyqtSignal(np.ndarray)
+    # Aviso de que hay un fotograma nuevo disponible en take_latest_frame()
+    frame_ready = pyqtSignal()
     # Señal que emite un mensaje de error si la cámara falla
     error = pyqtSignal(str)
+    # Señal emitida cuando la captura termina y la cámara se ha liberado
+    finished = pyqtSignal()
 
-    def __init__(self, camera_index: int, parent=None, frame_width: int = None, frame_height: int = None):
+    def __init__(self, camera_index: int, capture_resolution: Tuple[int, int], target_fps: int,
+                 low_latency: bool = True):
         """
-        Inicializa el hilo de la cámara.
+        Inicializa el trabajador de captura.
 
         Args:
             camera_index (int): El índice de la cámara a utilizar.
-            parent (QObject, optional): El objeto padre en la jerarquía de Qt.
-            frame_width (int, optional): Ancho del frame deseado. Si no se especifica, se usa el de la configuración.
-            frame_height (int, optional): Alto del frame deseado. Si no se especifica, se usa el de la configuración.
+            capture_resolution (Tuple[int, int]): Resolución (ancho, alto) solicitada a la cámara.
+            target_fps (int): FPS objetivo de emisión de fotogramas.
+            low_latency (bool): Reduce la cola del driver a un solo buffer para que cada
+                lectura devuelva el frame más reciente.
         """
-        super().__init__(parent)
+        super().__init__()
         self.camera_index = camera_index
+        self.capture_resolution = capture_resolution
+        self.target_fps = target_fps
+        self.low_latency = low_latency
+        self.frame_delay = 1.0 / self.target_fps if self.target_fps > 0 else 0.05
         self.running = False
         self.cap: Optional[cv2.VideoCapture] = None
 
-        # Cargar configuración de la cámara
-        config = ConfigManager.load_full_config()
-        
-        # Usar la resolución proporcionada o la de la configuración
-        if frame_width is not None and frame_height is not None:
-            self.capture_resolution = (frame_width, frame_height)
-        else:
-            self.capture_resolution = (
-                config['camera_settings'].get('FRAME_WIDTH', 1280),
-                config['camera_settings'].get('FRAME_HEIGHT', 720)
-            )
-            
-        self.target_fps = 20  # FPS objetivo para no sobrecargar la CPU
-        self.frame_delay = 1.0 / self.target_fps if self.target_fps > 0 else 0.05
+        self._latest_frame: Optional[np.ndarray] = None
+        self._latest_lock = threading.Lock()
+        self.frames_dropped = 0  # Frames sustituidos antes de que la GUI los consumiera (diagnóstico)
 
-    def run(self):
+        self._read_errors = 0
+        self._frame_counter = 0
+        self._next_due = 0.0  # Instante (perf_counter) a partir del cual toca decodificar el siguiente frame
+        self._auto_center_fn = None
+
+    @pyqtSlot()
+    def start_capture(self):
         """
-        Método principal del hilo. Contiene el bucle de captura de frames.
-        Este método se ejecuta cuando se llama a .start() en el hilo.
+        Abre la cámara y programa la primera lectura. Se conecta a QThread.started,
+        por lo que se ejecuta ya dentro del hilo de captura.
         """
         self.running = True
         logger.info(f"Iniciando hilo para cámara índice {self.camera_index} a {self.target_fps} FPS objetivo.")
@@ -62,76 +75,243 @@ class CameraThread(QThread):
                 error_msg = f"No se pudo abrir la cámara con índice {self.camera_index}. " \
                             "Verifique si está conectada o en uso por otra aplicación."
                 self.error.emit(error_msg)
-                self.running = False
                 logger.error(error_msg)
+                self._finish()
                 return
 
+            # Limitar la cola del driver justo al abrir, antes de que empiece a llenarse:
+            # con un solo buffer no se acumulan frames antiguos entre lecturas
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1 if self.low_latency else 2)
+            if self.low_latency:
+                self._enable_v4l2_low_latency()
+
             # Configurar propiedades de la cámara
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.capture_resolution[0])
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.capture_resolution[1])
-            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 2) # Limitar el buffer para obtener frames más recientes
+            self.cap.set(cv2.CAP_PROP_FPS, self.target_fps) # Pedir al driver la tasa objetivo si la soporta
 
             actual_w = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
             actual_h = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
-            logger.info(f"Cámara {self.camera_index} abierta. Resolución real: {int(actual_w)}x{int(actual_h)}")
-
-            read_errors = 0
-            frame_counter = 0
-            while self.running:
-                start_time = time.perf_counter()
-
-                ret, frame = self.cap.read()
-
-                if not ret:
-                    read_errors += 1
-                    logger.warning(f"Error al leer fotograma de cámara {self.camera_index} (Intento #{read_errors})")
-                    if read_errors > self.target_fps * 5: # Si falla por 5 segundos seguidos
-                        error_msg = f"Error persistente de lectura en cámara {self.camera_index}. La cámara podría estar desconectada."
-                        self.error.emit(error_msg)
-                        logger.error(error_msg)
-                        break
-                    time.sleep(0.1)
-                    continue
-                
-                read_errors = 0
-                frame_counter += 1
-
-                # Verificar centrado cada 300 frames (~15 segundos a 20fps)
-                if frame_counter % 300 == 0 and hasattr(roi_autoexp, 'auto_center_enabled'):
-                    if roi_autoexp.auto_center_enabled:
-                        height, width = frame.shape[:2]
-                        roi_autoexp.ensure_roi_centered(width, height)
-
-                # Emitir el fotograma volteado horizontalmente (efecto espejo para el usuario)
-                self.update_frame.emit(cv2.flip(frame, 1))
-
-                # Controlar los FPS para no consumir 100% de la CPU
-                elapsed_time = time.perf_counter() - start_time
-                sleep_time = self.frame_delay - elapsed_time
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+            native_fps = self.cap.get(cv2.CAP_PROP_FPS)
+            logger.info(f"Cámara {self.camera_index} abierta. Resolución real: {int(actual_w)}x{int(actual_h)} a {native_fps:.1f} FPS.")
+
+            # Resolver una sola vez la función de centrado del ROI; si el módulo no la expone
+            # (o no tiene el flag de centrado), el bloque de verificación se omite por completo.
+            self._auto_center_fn = getattr(roi_autoexp, 'ensure_roi_centered', None)
+            if not hasattr(roi_autoexp, 'auto_center_enabled'):
+                self._auto_center_fn = None
+
+            QTimer.singleShot(0, self._next_frame)
+
+        except Exception as e:
+            self._fail(e)
+
+    @pyqtSlot()
+    def _next_frame(self):
+        """Lee (como mucho) un fotograma y vuelve a programarse mientras la captura siga activa."""
+        if not self.running:
+            self._finish()
+            return
+
+        try:
+            # grab() bloquea al ritmo nativo del driver y no decodifica el frame.
+            # Solo se decodifica con retrieve() cuando toca emitir según el FPS objetivo,
+            # así los frames sobrantes se descartan sin coste de conversión ni sleep.
+            ret = self.cap.grab()
+            if ret:
+                now = time.perf_counter()
+                if now < self._next_due:
+                    QTimer.singleShot(0, self._next_frame)
+                    return
+                # El plazo avanza un paso fijo (no desde 'now'): así la tasa media es la objetivo
+                # aunque no sea divisor de la nativa (p. ej. 20 de 30 FPS, 2 de cada 3 frames)
+                self._next_due += self.frame_delay
+                if self._next_due < now:
+                    # Más de un periodo de retraso (arranque o cámara lenta): resincronizar
+                    self._next_due = now + self.frame_delay
+                ret, frame = self.cap.retrieve()
+
+            if not ret:
+                self._read_errors += 1
+                logger.warning(f"Error al leer fotograma de cámara {self.camera_index} (Intento #{self._read_errors})")
+                if self._read_errors > self.target_fps * 5: # Si falla por 5 segundos seguidos
+                    error_msg = f"Error persistente de lectura en cámara {self.camera_index}. La cámara podría estar desconectada."
+                    self.error.emit(error_msg)
+                    logger.error(error_msg)
+                    self._finish()
+                    return
+                QTimer.singleShot(100, self._next_frame)
+                return
+
+            self._read_errors = 0
+            self._frame_counter += 1
+            height, width = frame.shape[:2]
+
+            # Verificar centrado cada 300 frames (~15 segundos a 20fps)
+            if self._auto_center_fn is not None and self._frame_counter % 300 == 0 and roi_autoexp.auto_center_enabled:
+                self._auto_center_fn(width, height)
+
+            # Publicar el fotograma tal cual; el efecto espejo se aplica solo en la visualización
+            self._publish_frame(frame)
+            QTimer.singleShot(0, self._next_frame)
 
         except Exception as e:
-            error_msg = f"Excepción inesperada en el hilo de la cámara: {e}"
-            self.error.emit(error_msg)
-            logger.critical(error_msg, exc_info=True)
-        finally:
-            if self.cap and self.cap.isOpened():
-                self.cap.release()
-            logger.info(f"Hilo para cámara {self.camera_index} detenido y recursos liberados.")
-            self.running = False
+            self._fail(e)
+
+    def _publish_frame(self, frame: np.ndarray):
+        """Guarda el frame como el más reciente; solo avisa si no había uno pendiente de consumir."""
+        with self._latest_lock:
+            notify = self._latest_frame is None
+            if not notify:
+                self.frames_dropped += 1
+            self._latest_frame = frame
+        if notify:
+            self.frame_ready.emit()
+
+    def take_latest_frame(self) -> Optional[np.ndarray]:
+        """Devuelve el frame más reciente y vacía el buzón (None si ya se consumió)."""
+        with self._latest_lock:
+            frame, self._latest_frame = self._latest_frame, None
+        return frame
+
+    def _enable_v4l2_low_latency(self):
+        """
+        En Linux activa el control V4L2 'low_latency_mode' si el dispositivo lo ofrece.
+        Es opcional: sin v4l2-ctl o sin soporte del driver simplemente no se aplica.
+        """
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            result = subprocess.run(
+                ['v4l2-ctl', '-d', f'/dev/video{self.camera_index}', '-c', 'low_latency_mode=1'],
+                capture_output=True, timeout=2
+            )
+            if result.returncode == 0:
+                logger.info(f"Modo de baja latencia V4L2 activado en cámara {self.camera_index}.")
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.debug(f"No se pudo activar low_latency_mode en cámara {self.camera_index}: {e}")
+
+    def _fail(self, e: Exception):
+        error_msg = f"Excepción inesperada en el hilo de la cámara: {e}"
+        self.error.emit(error_msg)
+        logger.critical(error_msg, exc_info=True)
+        self._finish()
+
+    def _finish(self):
+        """Libera la cámara y notifica el fin de la captura."""
+        self.running = False
+        if self.cap and self.cap.isOpened():
+            self.cap.release()
+        logger.info(f"Hilo para cámara {self.camera_index} detenido y recursos liberados "
+                    f"({self.frames_dropped} de {self._frame_counter} frames descartados por no consumirse a tiempo).")
+        self.finished.emit()
+        # Salir del event loop desde aquí mismo (QThread.quit es thread-safe): una conexión
+        # finished -> quit se encolaría al hilo de la GUI, que puede estar bloqueado en wait()
+        thread = self.thread()
+        if thread is not None:
+            thread.quit()
+
+
+class CameraThread(QObject):
+    """
+    Captura de frames de la cámara sin bloquear la interfaz gráfica.
+    Mantiene la interfaz de un hilo (start/stop/wait/isRunning), pero la captura la hace
+    un CameraWorker movido a un QThread propio. 'update_frame' se emite en el hilo de
+    este objeto (el de la GUI) con el último frame disponible: los frames que llegan
+    mientras la GUI está ocupada se descartan en lugar de encolarse. 'error' es la
+    señal del trabajador.
+    """
+    # Señal que emite un fotograma capturado como un array de numpy
+    update_frame = pyqtSignal(np.ndarray)
+
+    def __init__(self, camera_index: int, parent=None, frame_width: int = None, frame_height: int = None,
+                 low_latency: Optional[bool] = None):
+        """
+        Inicializa el hilo de la cámara.
+
+        Args:
+            camera_index (int): El índice de la cámara a utilizar.
+            parent (QObject, optional): El objeto padre en la jerarquía de Qt.
+            frame_width (int, optional): Ancho del frame deseado. Si no se especifica, se usa el de la configuración.
+            frame_height (int, optional): Alto del frame deseado. Si no se especifica, se usa el de la configuración.
+            low_latency (bool, optional): Captura con un solo buffer en el driver. Si no se especifica,
+                se usa 'low_latency' de la configuración (activado por defecto).
+        """
+        super().__init__(parent)
+        self.camera_index = camera_index
+
+        # Cargar configuración de la cámara
+        config = ConfigManager.load_full_config()
+        
+        # Usar la resolución proporcionada o la de la configuración
+        if frame_width is not None and frame_height is not None:
+            self.capture_resolution = (frame_width, frame_height)
+        else:
+            self.capture_resolution = (
+                config['camera_settings'].get('FRAME_WIDTH', 1280),
+                config['camera_settings'].get('FRAME_HEIGHT', 720)
+            )
+            
+        self.target_fps = 20  # FPS objetivo para no sobrecargar la CPU
+        if low_latency is None:
+            low_latency = config['camera_settings'].get('low_latency', True)
+
+        # El trabajador no puede tener padre para poder moverse a otro hilo
+        self._thread = QThread(self)
+        self._worker = CameraWorker(self.camera_index, self.capture_resolution, self.target_fps, low_latency)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.start_capture)
+        # El propio trabajador sale del event loop de su hilo al terminar (ver CameraWorker._finish)
+        # Conexión en cola: _deliver_latest_frame se ejecuta en el hilo de este objeto
+        self._worker.frame_ready.connect(self._deliver_latest_frame)
+
+    @pyqtSlot()
+    def _deliver_latest_frame(self):
+        """Reenvía a los receptores el frame más reciente del trabajador."""
+        frame = self._worker.take_latest_frame()
+        if frame is not None:
+            self.update_frame.emit(frame)
+
+    @property
+    def error(self):
+        """Señal del trabajador que emite los errores de la cámara."""
+        return self._worker.error
+
+    @property
+    def cap(self) -> Optional[cv2.VideoCapture]:
+        """Captura de OpenCV activa (None hasta que el trabajador abre la cámara)."""
+        return self._worker.cap
+
+    @property
+    def running(self) -> bool:
+        return self._worker.running
+
+    def start(self):
+        """Arranca el QThread; la captura comienza en CameraWorker.start_capture."""
+        self._thread.start()
+
+    def isRunning(self) -> bool:
+        return self._thread.isRunning()
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Espera a que el hilo de captura termine (msecs < 0 espera indefinidamente)."""
+        return self._thread.wait() if msecs < 0 else self._thread.wait(msecs)
 
     def stop(self):
         """
         Solicita la detención segura del bucle de captura del hilo.
         """
         logger.info(f"Solicitando detención del hilo de la cámara {self.camera_index}.")
-        self.running = False
+        self._worker.running = False
 
     def __del__(self):
         """
-        Destructor para asegurar que la cámara se libere si el objeto se elimina.
+        Destructor: solicita la detención para que el trabajador libere la cámara.
+        No espera al hilo, para no bloquear a quien libere la última referencia.
         """
-        if self.isRunning():
-            self.stop()
-            self.wait() # Esperar a que el hilo termine limpiamente
\ No newline at end of file
+        try:
+            if self._thread.isRunning():
+                self.stop()
+        except RuntimeError:
+            # El QThread ya fue destruido junto con su padre
+            pass
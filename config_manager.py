@@ -2,10 +2,143 @@
 
 import json
 import os
+import copy
 import hashlib
+import hmac
 import time
 from logging_setup import logger
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Mapping
+
+# orjson es opcional: si está instalado se usa para leer/escribir config.json,
+# si no, se recurre al módulo json estándar con el mismo formato de salida
+# (sangría de 2 espacios y UTF-8 sin escapar).
+try:
+    import orjson
+
+    def _loads(data: bytes) -> Any:
+        return orjson.loads(data)
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def _loads(data: bytes) -> Any:
+        return json.loads(data)
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+# Estructura de configuración completa con valores por defecto. Se construye una sola vez
+# al importar el módulo; ConfigManager.get_default_config() devuelve copias.
+_DEFAULT_CONFIG_TEMPLATE: Dict[str, Any] = {
+    "camera_settings": {
+        "camera_index": 0,
+        "FRAME_WIDTH": 1280,
+        "FRAME_HEIGHT": 720,
+        "MAX_CAMERA_INDEX_TO_CHECK": 4,
+        "low_latency": True,
+        "last_detected": []
+    },
+    "recognition_settings": {
+        "model_filename": "w600k_mbf.onnx",
+        "model_name": "ArcFace Buffalo S",
+        "threshold": 0.45,
+        "mode": "multi-pose",
+        "pose_limits": {
+            "MAX_ABS_PITCH": 20.0,
+            "MAX_ABS_YAW": 25.0,
+            "MAX_ABS_ROLL": 20.0
+        }
+    },
+    "fatigue_detection_thresholds": {
+        "EAR_THRESHOLD": 0.23,
+        "MOE_THRESHOLD": 0.4,
+        "YAWN_FRAMES_THRESHOLD": 22,
+        "DISTRACTION_FRAMES_THRESHOLD": 60,
+        "STATIC_POSITION_SECONDS": 3600,
+        "EYE_RUBBING_FRAMES": 15
+    },
+    "event_toggles": {
+        "Despierta": True, "Distraccion": True, "Somnolencia": True,
+        "Estiramiento": True, "Posicion Estatica": True, "Frotar Ojos": True,
+        "Cabeceo": True, "Bostezar": True
+    },
+    "voice_alerts": {
+        "Despierta": {"enabled": True, "text": "Despierta. Mantente alerta.", "priority": 0},
+        "Cabeceo": {"enabled": True, "text": "Peligro de microsueño detectado.", "priority": 0},
+        "Distraccion": {"enabled": True, "text": "Atención a la carretera.", "priority": 1},
+        "Somnolencia": {"enabled": True, "text": "Se detecta somnolencia.", "priority": 1},
+        "Bostezar": {"enabled": True, "text": "Parece que estás cansado.", "priority": 2},
+        "Frotar Ojos": {"enabled": True, "text": "Descansa la vista.", "priority": 2},
+        "Posicion Estatica": {"enabled": True, "text": "Llevas mucho tiempo en la misma posición, considera moverte.", "priority": 3},
+        "Estiramiento": {"enabled": True, "text": "Un estiramiento es una buena idea.", "priority": 3}
+    },
+    "privacy_settings": {
+        "privacy_mode_default": True,
+        "photo_view_password_hash": "",
+        "photo_view_salt": "",
+        "photo_view_kdf": "",
+        "recovery_code_hash": ""
+    },
+    "state_machine_thresholds": {
+        "stable_face_frames_to_identify": 90,
+        "face_lost_frames_to_logout": 900,
+        "auto_register_seconds": 15
+    },
+    "profile_enrichment": {
+        "enabled": True,
+        "embeddings_per_session_target": 5,
+        "min_pose_difference_threshold": 15.0
+    },
+    "hardware_settings": {
+        "USE_MPU": False,
+        "mpu_sleep_threshold_minutes": 5,
+        "mpu_accel_threshold": 0.5,
+        "mpu_gyro_threshold": 0.5
+    },
+    "pausa_activa_settings": {
+        "work_duration_seconds": 3600,
+        "reset_threshold_seconds": 180
+    },
+    "reporting_settings": {
+        "SAVE_LOG_ON_SESSION_END": True
+    },
+    "roi_autoexposure_settings": {
+        "ROI_ENABLED": True,
+        "EXPOSURE_TARGET": 127,
+        "GAMMA_VALUE": 1.1,
+        "AUTO_CENTER_DEFAULT": True,
+        "CENTER_CONFIG": {
+            "ROI_WIDTH_PERCENT": 0.6,
+            "ROI_HEIGHT_PERCENT": 0.6,
+            "MIN_ROI_WIDTH": 200,
+            "MIN_ROI_HEIGHT": 150,
+            "MAX_ROI_WIDTH": 800,
+            "MAX_ROI_HEIGHT": 600
+        }
+    },
+    "lstm_model_path": "models/D.pth",
+    "use_lstm_classification": True,
+    "lstm_precision": "fp32",
+    "zoom_settings": {
+        "ZOOM_FACTOR_CALIBRATION": 1.5,
+        "ZOOM_FACTOR_INFERENCE": 1.5,
+        "ZOOM_POSITION": "top-right",
+        "RESIZE_ZOOM_BOX": True
+    },
+    "performance": {
+        "opencv_threads": 0,
+        "face_presence_gate": True,
+        "mediapipe_max_width": 640
+    },
+    "drowsiness_levels": {
+        "LEVE": 60,
+        "MODERADO": 90,
+        "SEVERO": 120
+    }
+}
+
+_DEFAULT_CONFIG_VIEW = MappingProxyType(_DEFAULT_CONFIG_TEMPLATE)
 
 class ConfigManager:
     """
@@ -15,107 +148,47 @@ class ConfigManager:
     
     CONFIG_FILE = "config.json"
 
+    # Función de derivación de clave usada para las nuevas claves. Las claves antiguas
+    # (sin etiqueta 'photo_view_kdf') usan PBKDF2 y se migran al verificarse con éxito.
+    PASSWORD_KDF = "scrypt-n15-r8-p1"
+    LEGACY_PASSWORD_KDF = "pbkdf2-sha256-100000"
+
+    # Caché en memoria de la última lectura, invalidada por el mtime del archivo
+    _cache: Optional[Dict[str, Any]] = None
+    _cache_mtime: int = 0
+
+    # Huella y mtime de la última escritura, para omitir guardados sin cambios
+    _last_written_digest: Optional[bytes] = None
+    _last_written_mtime: Optional[int] = None
+
     @staticmethod
     def get_default_config() -> Dict[str, Any]:
-        """Devuelve la estructura de configuración completa con valores por defecto."""
-        return {
-            "camera_settings": {
-                "camera_index": 0,
-                "FRAME_WIDTH": 1280,
-                "FRAME_HEIGHT": 720,
-                "MAX_CAMERA_INDEX_TO_CHECK": 4
-            },
-            "recognition_settings": {
-                "model_filename": "w600k_mbf.onnx",
-                "model_name": "ArcFace Buffalo S",
-                "threshold": 0.45,
-                "mode": "multi-pose",
-                "pose_limits": {
-                    "MAX_ABS_PITCH": 20.0,
-                    "MAX_ABS_YAW": 25.0,
-                    "MAX_ABS_ROLL": 20.0
-                }
-            },
-            "fatigue_detection_thresholds": {
-                "EAR_THRESHOLD": 0.23,
-                "MOE_THRESHOLD": 0.4,
-                "YAWN_FRAMES_THRESHOLD": 22,
-                "DISTRACTION_FRAMES_THRESHOLD": 60,
-                "STATIC_POSITION_SECONDS": 3600,
-                "EYE_RUBBING_FRAMES": 15
-            },
-            "event_toggles": {
-                "Despierta": True, "Distraccion": True, "Somnolencia": True,
-                "Estiramiento": True, "Posicion Estatica": True, "Frotar Ojos": True,
-                "Cabeceo": True, "Bostezar": True
-            },
-            "voice_alerts": {
-                "Despierta": {"enabled": True, "text": "Despierta. Mantente alerta.", "priority": 0},
-                "Cabeceo": {"enabled": True, "text": "Peligro de microsueño detectado.", "priority": 0},
-                "Distraccion": {"enabled": True, "text": "Atención a la carretera.", "priority": 1},
-                "Somnolencia": {"enabled": True, "text": "Se detecta somnolencia.", "priority": 1},
-                "Bostezar": {"enabled": True, "text": "Parece que estás cansado.", "priority": 2},
-                "Frotar Ojos": {"enabled": True, "text": "Descansa la vista.", "priority": 2},
-                "Posicion Estatica": {"enabled": True, "text": "Llevas mucho tiempo en la misma posición, considera moverte.", "priority": 3},
-                "Estiramiento": {"enabled": True, "text": "Un estiramiento es una buena idea.", "priority": 3}
-            },
-            "privacy_settings": {
-                "privacy_mode_default": True,
-                "photo_view_password_hash": "",
-                "photo_view_salt": "",
-                "recovery_code_hash": ""
-            },
-            "state_machine_thresholds": {
-                "stable_face_frames_to_identify": 90,
-                "face_lost_frames_to_logout": 900,
-                "auto_register_seconds": 15
-            },
-            "profile_enrichment": {
-                "enabled": True,
-                "embeddings_per_session_target": 5,
-                "min_pose_difference_threshold": 15.0
-            },
-            "hardware_settings": {
-                "USE_MPU": False,
-                "mpu_sleep_threshold_minutes": 5,
-                "mpu_accel_threshold": 0.5,
-                "mpu_gyro_threshold": 0.5
-            },
-            "pausa_activa_settings": {
-                "work_duration_seconds": 3600,
-                "reset_threshold_seconds": 180
-            },
-            "reporting_settings": {
-                "SAVE_LOG_ON_SESSION_END": True
-            },
-            "roi_autoexposure_settings": {
-                "ROI_ENABLED": True,
-                "EXPOSURE_TARGET": 127,
-                "GAMMA_VALUE": 1.1,
-                "AUTO_CENTER_DEFAULT": True,
-                "CENTER_CONFIG": {
-                    "ROI_WIDTH_PERCENT": 0.6,
-                    "ROI_HEIGHT_PERCENT": 0.6,
-                    "MIN_ROI_WIDTH": 200,
-                    "MIN_ROI_HEIGHT": 150,
-                    "MAX_ROI_WIDTH": 800,
-                    "MAX_ROI_HEIGHT": 600
-                }
-            },
-            "lstm_model_path": "models/D.pth",
-            "use_lstm_classification": True,
-            "zoom_settings": {
-                "ZOOM_FACTOR_CALIBRATION": 1.5,
-                "ZOOM_FACTOR_INFERENCE": 1.5,
-                "ZOOM_POSITION": "top-right",
-                "RESIZE_ZOOM_BOX": True
-            },
-            "drowsiness_levels": {
-                "LEVE": 60,
-                "MODERADO": 90,
-                "SEVERO": 120
-            }
-        }
+        """Devuelve una copia mutable de la estructura de configuración completa con valores por defecto."""
+        return copy.deepcopy(_DEFAULT_CONFIG_TEMPLATE)
+
+    @staticmethod
+    def get_default_config_view() -> Mapping[str, Any]:
+        """
+        Devuelve una vista de solo lectura de la configuración por defecto, sin copiarla.
+        Las secciones anidadas se comparten con la plantilla y no deben modificarse.
+        """
+        return _DEFAULT_CONFIG_VIEW
+
+    @staticmethod
+    def _merge_missing_keys(default: Mapping[str, Any], user: Dict[str, Any]) -> bool:
+        """
+        Añade a 'user' (en sitio) las claves de 'default' que le falten, recorriendo
+        las secciones anidadas. Devuelve True si se añadió alguna clave.
+        """
+        changed = False
+        for key, value in default.items():
+            if key not in user:
+                user[key] = copy.deepcopy(value)
+                changed = True
+            elif isinstance(value, dict) and isinstance(user[key], dict):
+                if ConfigManager._merge_missing_keys(value, user[key]):
+                    changed = True
+        return changed
 
     @staticmethod
     def setup_config_file() -> bool:
@@ -124,32 +197,22 @@ class ConfigManager:
         lo crea con valores por defecto. Si existe pero le faltan claves, las añade.
         Devuelve True si se necesita configurar una clave inicial.
         """
-        default_config = ConfigManager.get_default_config()
         if not os.path.exists(ConfigManager.CONFIG_FILE):
             logger.info("No se encontró config.json. Creando uno nuevo con valores por defecto.")
-            ConfigManager.save_full_config(default_config)
+            ConfigManager.save_full_config(ConfigManager.get_default_config())
             return True
 
         try:
-            with open(ConfigManager.CONFIG_FILE, 'r', encoding='utf-8') as f:
-                user_config = json.load(f)
+            with open(ConfigManager.CONFIG_FILE, 'rb') as f:
+                user_config = _loads(f.read())
         except (json.JSONDecodeError, IOError):
             logger.error(f"'{ConfigManager.CONFIG_FILE}' está corrupto. Se creará uno nuevo y se respaldará el antiguo.")
             os.rename(ConfigManager.CONFIG_FILE, f"{ConfigManager.CONFIG_FILE}.{int(time.time())}.bak")
-            ConfigManager.save_full_config(default_config)
+            ConfigManager.save_full_config(ConfigManager.get_default_config())
             return True
         
-        needs_update = False
-        def update_dict_recursively(default, user):
-            nonlocal needs_update
-            for key, value in default.items():
-                if key not in user:
-                    user[key] = value
-                    needs_update = True
-                elif isinstance(value, dict) and isinstance(user.get(key), dict):
-                    update_dict_recursively(value, user[key])
-        
-        update_dict_recursively(default_config, user_config)
+        # Se compara contra la plantilla; solo se copian las secciones que falten
+        needs_update = ConfigManager._merge_missing_keys(_DEFAULT_CONFIG_TEMPLATE, user_config)
 
         if needs_update:
             logger.info("Actualizando config.json con nuevas claves y secciones por defecto.")
@@ -157,41 +220,142 @@ class ConfigManager:
         
         return not user_config.get('privacy_settings', {}).get('photo_view_password_hash')
 
-    @staticmethod
-    def load_full_config() -> Dict[str, Any]:
-        """Carga el archivo de configuración completo desde config.json."""
+    @classmethod
+    def load_full_config(cls) -> Dict[str, Any]:
+        """
+        Carga el archivo de configuración completo desde config.json.
+        Si el archivo no ha cambiado desde la última lectura, devuelve una copia de la caché.
+        """
         try:
-            with open(ConfigManager.CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            mtime = os.stat(cls.CONFIG_FILE).st_mtime_ns
+            if cls._cache is not None and mtime == cls._cache_mtime:
+                return copy.deepcopy(cls._cache)
+
+            with open(cls.CONFIG_FILE, 'rb') as f:
+                config_data = _loads(f.read())
+            cls._cache = config_data
+            cls._cache_mtime = mtime
+            return copy.deepcopy(config_data)
         except (FileNotFoundError, json.JSONDecodeError) as e:
-            logger.error(f"'{ConfigManager.CONFIG_FILE}' no encontrado o corrupto: {e}. Usando configuración por defecto.")
-            return ConfigManager.get_default_config()
+            cls._cache = None
+            logger.error(f"'{cls.CONFIG_FILE}' no encontrado o corrupto: {e}. Usando configuración por defecto.")
+            return cls.get_default_config()
 
-    @staticmethod
-    def save_full_config(config_data: Dict[str, Any]):
-        """Guarda un diccionario de configuración completo en el archivo config.json."""
+    @classmethod
+    def save_full_config(cls, config_data: Dict[str, Any]):
+        """
+        Guarda un diccionario de configuración completo en el archivo config.json.
+        La escritura es atómica (archivo temporal + os.replace) y se omite si el
+        contenido serializado es idéntico al último escrito y el archivo no ha cambiado.
+        """
         try:
-            with open(ConfigManager.CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=4, ensure_ascii=False)
-            logger.info(f"Configuración guardada exitosamente en '{ConfigManager.CONFIG_FILE}'.")
+            data = _dumps(config_data)
+            digest = hashlib.sha256(data).digest()
+            try:
+                mtime = os.stat(cls.CONFIG_FILE).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if digest == cls._last_written_digest and mtime == cls._last_written_mtime:
+                logger.debug(f"'{cls.CONFIG_FILE}' sin cambios; se omite la escritura.")
+                return
+
+            cls._cache = None  # La próxima lectura vuelve a cargar desde disco
+            tmp_file = f"{cls.CONFIG_FILE}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, cls.CONFIG_FILE)
+            cls._last_written_digest = digest
+            cls._last_written_mtime = os.stat(cls.CONFIG_FILE).st_mtime_ns
+            logger.info(f"Configuración guardada exitosamente en '{cls.CONFIG_FILE}'.")
         except Exception as e:
-            logger.error(f"Error crítico al guardar en '{ConfigManager.CONFIG_FILE}': {e}")
+            logger.error(f"Error crítico al guardar en '{cls.CONFIG_FILE}': {e}")
+
+    # --- Instancia compartida en memoria ---
+
+    _instance: Optional['ConfigManager'] = None
+
+    @classmethod
+    def get(cls) -> 'ConfigManager':
+        """
+        Devuelve la instancia compartida que mantiene la configuración en memoria.
+        Los cambios hechos con set() se acumulan y solo se escriben a disco con flush().
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self._data: Dict[str, Any] = self.load_full_config()
+        self._pending: Dict[str, Any] = {}  # Cambios aún no escritos, por ruta 'seccion.clave'
+        self._dirty = False
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """Diccionario de configuración compartido (no modificar directamente: usar set())."""
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    @staticmethod
+    def _set_path(config: Dict[str, Any], path: str, value: Any):
+        *sections, key = path.split('.')
+        for section in sections:
+            config = config.setdefault(section, {})
+        config[key] = value
+
+    def set(self, path: str, value: Any):
+        """Cambia un valor indicado por su ruta (p. ej. 'camera_settings.camera_index') y marca la configuración como modificada."""
+        self._set_path(self._data, path, value)
+        self._pending[path] = value
+        self._dirty = True
+
+    def flush(self):
+        """Escribe la configuración a disco si hay cambios pendientes."""
+        if not self._dirty:
+            return
+        self.save_full_config(self._data)
+        self._pending.clear()
+        self._dirty = False
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        Vuelve a leer la configuración tras una escritura externa (diálogo de ajustes,
+        cambio de clave), conservando los cambios pendientes, y devuelve el nuevo diccionario.
+        """
+        self._data = self.load_full_config()
+        for path, value in self._pending.items():
+            self._set_path(self._data, path, value)
+        return self._data
+
+    @staticmethod
+    def _hash_password(password: str, salt: str, kdf: str) -> str:
+        """Deriva el hash hexadecimal de una clave con la función indicada por 'kdf'."""
+        if kdf == ConfigManager.PASSWORD_KDF:
+            return hashlib.scrypt(password.encode('utf-8'), salt=salt.encode('utf-8'),
+                                  n=2**15, r=8, p=1, dklen=32, maxmem=64 * 1024 * 1024).hex()
+        if kdf == ConfigManager.LEGACY_PASSWORD_KDF:
+            return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
+        raise ValueError(f"Función de derivación de clave desconocida: '{kdf}'")
+
+    @staticmethod
+    def _store_password_hash(config: Dict[str, Any], password: str):
+        """Genera sal y hash con la KDF actual y los escribe en la sección de privacidad."""
+        salt = os.urandom(16).hex()
+        privacy_settings = config.setdefault('privacy_settings', {})
+        privacy_settings['photo_view_password_hash'] = ConfigManager._hash_password(password, salt, ConfigManager.PASSWORD_KDF)
+        privacy_settings['photo_view_salt'] = salt
+        privacy_settings['photo_view_kdf'] = ConfigManager.PASSWORD_KDF
 
     @staticmethod
     def set_new_password(password: str) -> str:
         """Genera hash y sal para una nueva clave, la guarda y devuelve un código de recuperación."""
         config = ConfigManager.load_full_config()
-        salt = os.urandom(16).hex()
-        hashed_password = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
+        ConfigManager._store_password_hash(config, password)
         
         recovery_code = f"CID-{os.urandom(2).hex().upper()}-{os.urandom(2).hex().upper()}"
         hashed_recovery_code = hashlib.sha256(recovery_code.encode('utf-8')).hexdigest()
 
-        if 'privacy_settings' not in config:
-            config['privacy_settings'] = {}
-            
-        config['privacy_settings']['photo_view_password_hash'] = hashed_password
-        config['privacy_settings']['photo_view_salt'] = salt
         config['privacy_settings']['recovery_code_hash'] = hashed_recovery_code
         
         ConfigManager.save_full_config(config)
@@ -205,14 +369,23 @@ class ConfigManager:
         privacy_settings = config.get('privacy_settings', {})
         stored_hash = privacy_settings.get('photo_view_password_hash', '')
         stored_salt = privacy_settings.get('photo_view_salt', '')
+        stored_kdf = privacy_settings.get('photo_view_kdf') or ConfigManager.LEGACY_PASSWORD_KDF
         
         if not stored_hash or not stored_salt:
             logger.warning("Intento de verificar clave, pero no hay ninguna configurada.")
             return False
         
         try:
-            current_hash = hashlib.pbkdf2_hmac('sha256', password_to_check.encode('utf-8'), stored_salt.encode('utf-8'), 100000).hex()
-            return current_hash == stored_hash
+            current_hash = ConfigManager._hash_password(password_to_check, stored_salt, stored_kdf)
+            if not hmac.compare_digest(current_hash, stored_hash):
+                return False
+
+            # Migración perezosa: re-derivar con la KDF actual tras un acceso correcto
+            if stored_kdf != ConfigManager.PASSWORD_KDF:
+                ConfigManager._store_password_hash(config, password_to_check)
+                ConfigManager.save_full_config(config)
+                logger.info("Hash de la clave de privacidad migrado a la nueva función de derivación.")
+            return True
         except Exception as e:
             logger.error(f"Error durante la verificación de clave: {e}")
             return False
@@ -227,4 +400,4 @@ class ConfigManager:
             return False
 
         current_hash = hashlib.sha256(code_to_check.encode('utf-8')).hexdigest()
-        return current_hash == stored_hash
\ No newline at end of file
+        return hmac.compare_digest(current_hash, stored_hash)
\ No newline at end of file
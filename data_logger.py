@@ -5,7 +5,11 @@ Incluye funciones para guardar métricas faciales e imágenes de eventos.
 
 import os
 import csv
+import struct
+import atexit
+import concurrent.futures
 import cv2
+import numpy as np
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any
@@ -15,21 +19,44 @@ os.makedirs("logs/data_history", exist_ok=True)
 os.makedirs("logs/sleep_events", exist_ok=True)
 os.makedirs("logs/hdr_images", exist_ok=True)
 
+# Formato binario de una fila de características: timestamp (float64), ear, mar, puc, moe,
+# head_angle_x, head_angle_y (float32) y event_type (UTF-8, 32 bytes rellenos con ceros).
+FEATURE_ROW_STRUCT = struct.Struct('<d6f32s')
+
 class DataLogger:
     """
     Clase para manejar el registro de datos de monitoreo.
     """
+
+    # Número de filas escritas entre cada volcado explícito del CSV a disco
+    FLUSH_EVERY_ROWS = 50
+
+    # Hilo único para codificar y escribir imágenes sin bloquear el bucle de detección
+    _writer_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='img-writer')
     
-    def __init__(self, base_dir: str = "logs"):
+    def __init__(self, base_dir: str = "logs", binary: bool = False):
         """
         Inicializa el gestor de registro de datos.
         
         Args:
             base_dir: Directorio base para guardar los logs
+            binary: Si es True, las filas se empaquetan en binario (FEATURE_ROW_STRUCT) en
+                    'features_history.bin' y se vuelcan al CSV solo al cerrar la sesión.
         """
         self.base_dir = Path(base_dir)
         self.csv_file = self.base_dir / "data_history" / "features_history.csv"
+        self.bin_file = self.base_dir / "data_history" / "features_history.bin"
+        self.binary = binary
         self._ensure_csv_headers()
+
+        # Manejador persistente para evitar abrir/cerrar el archivo en cada fila
+        if self.binary:
+            self._bin_fh = open(self.bin_file, 'ab', buffering=1 << 16)
+        else:
+            self._csv_fh = open(self.csv_file, 'a', newline='', buffering=1 << 16)
+            self._csv_writer = csv.writer(self._csv_fh)
+        self._row_count = 0
+        atexit.register(self.close)
     
     def _ensure_csv_headers(self):
         """Asegura que el archivo CSV tenga los encabezados correctos."""
@@ -55,6 +82,20 @@ class DataLogger:
         """
         angle_x = angles.get('x', 0.0) if angles else 0.0
         angle_y = angles.get('y', 0.0) if angles else 0.0
+
+        if self.binary:
+            self._bin_fh.write(FEATURE_ROW_STRUCT.pack(
+                timestamp,
+                metrics.get('ear', 0.0),
+                metrics.get('mar', 0.0),
+                metrics.get('puc', 0.0),
+                metrics.get('moe', 0.0),
+                angle_x,
+                angle_y,
+                event_type.encode('utf-8')[:32]
+            ))
+            self._row_count += 1
+            return
         
         row = [
             datetime.fromtimestamp(timestamp).isoformat(),
@@ -67,19 +108,58 @@ class DataLogger:
             event_type
         ]
         
+        self._csv_writer.writerow(row)
+        self._row_count += 1
+        if self._row_count % self.FLUSH_EVERY_ROWS == 0:
+            self._csv_fh.flush()
+
+    def close(self) -> None:
+        """Vuelca las filas pendientes y cierra el archivo CSV (o exporta el binario a CSV)."""
+        if self.binary:
+            if not self._bin_fh.closed:
+                self._bin_fh.close()
+                self.export_binary_to_csv()
+        elif not self._csv_fh.closed:
+            self._csv_fh.flush()
+            self._csv_fh.close()
+
+    def export_binary_to_csv(self) -> int:
+        """
+        Añade al CSV las filas del archivo binario y lo vacía.
+        
+        Returns:
+            int: Número de filas exportadas
+        """
+        if not self.bin_file.exists():
+            return 0
+        data = self.bin_file.read_bytes()
+        usable = len(data) - len(data) % FEATURE_ROW_STRUCT.size  # Ignorar una fila final incompleta
+        exported = 0
         with open(self.csv_file, 'a', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow(row)
+            for ts, ear, mar, puc, moe, ax, ay, event in FEATURE_ROW_STRUCT.iter_unpack(data[:usable]):
+                writer.writerow([
+                    datetime.fromtimestamp(ts).isoformat(),
+                    # float32 tiene ~7 cifras significativas; evitar el ruido de la conversión a float64
+                    *(f"{v:.7g}" for v in (ear, mar, puc, moe, ax, ay)),
+                    event.rstrip(b'\0').decode('utf-8', errors='ignore')
+                ])
+                exported += 1
+        self.bin_file.write_bytes(b'')
+        return exported
     
     @staticmethod
-    def save_sleep_image(image: np.ndarray, user_code: str, event_type: str = 'sleep') -> str:
+    def save_sleep_image(image: np.ndarray, user_code: str, event_type: str = 'sleep', is_rgb: bool = False) -> str:
         """
         Guarda una imagen de un evento de sueño o fatiga.
+        La codificación PNG (compresión rápida, nivel 1) se realiza en un hilo de fondo;
+        la ruta se devuelve de inmediato.
         
         Args:
             image: Imagen a guardar (formato BGR de OpenCV)
             user_code: Código del usuario
             event_type: Tipo de evento ('sleep', 'yawn', 'distraction', etc.)
+            is_rgb: Indica que la imagen viene en RGB y debe pasarse a BGR antes de guardar
             
         Returns:
             str: Ruta al archivo guardado
@@ -88,13 +168,13 @@ class DataLogger:
         filename = f"{user_code}_{event_type}_{timestamp}.png"
         filepath = Path("logs/sleep_events") / filename
         
-        # Convertir a RGB si es necesario
-        if len(image.shape) == 3 and image.shape[2] == 3:
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        # cv2.imwrite espera BGR; solo se convierte si el llamador entrega RGB
+        if is_rgb and len(image.shape) == 3 and image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
         else:
-            image_rgb = image
+            image = image.copy()  # El llamador puede reutilizar su buffer mientras se escribe
         
-        cv2.imwrite(str(filepath), image_rgb)
+        DataLogger._writer_pool.submit(cv2.imwrite, str(filepath), image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
         return str(filepath)
     
     @staticmethod
@@ -4,9 +4,140 @@ import sqlite3
 import os
 import numpy as np
 import time
-from typing import List, Dict, Any, Optional, Tuple
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from logging_setup import logger
 
+# Sufijo de 'modelo_embedding' que marca los embeddings guardados en INT8
+# (escala float32 por vector seguida de los componentes int8).
+INT8_EMBEDDING_SUFFIX = "-int8"
+
+
+def quantize_embedding(embedding: np.ndarray) -> bytes:
+    """
+    Cuantiza un embedding a INT8 con escala simétrica por vector (max|v| / 127).
+    Devuelve 4 bytes de escala (float32) seguidos de un byte por componente.
+    """
+    v = np.asarray(embedding, dtype=np.float32).ravel()
+    max_abs = float(np.abs(v).max()) if v.size else 0.0
+    scale = max_abs / 127.0 if max_abs > 0 else 1.0
+    q = np.clip(np.rint(v / scale), -127, 127).astype(np.int8)
+    return np.float32(scale).tobytes() + q.tobytes()
+
+
+def dequantize_embedding(blob: bytes) -> np.ndarray:
+    """Reconstruye un embedding float32 (normalizado L2) a partir de un blob INT8."""
+    scale = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+    v = np.frombuffer(blob, dtype=np.int8, offset=4).astype(np.float32) * scale
+    norm = np.linalg.norm(v)
+    return v / norm if norm > 1e-6 else v
+
+
+class _BatchWriter:
+    """
+    Escritor en segundo plano para inserciones frecuentes (p. ej. eventos de comportamiento).
+    Las filas se encolan sin bloquear y un hilo dedicado las inserta por lotes con
+    executemany en una sola transacción: hasta MAX_BATCH filas o cada FLUSH_INTERVAL segundos.
+    """
+    MAX_BATCH = 256
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, table: str, columns: Tuple[str, ...]):
+        self.table = table
+        self._query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._loop, name=f"db-writer-{table}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, row: tuple):
+        """Encola una fila para insertarla en el siguiente lote."""
+        self._queue.put(row)
+
+    def flush(self, timeout: float = 5.0):
+        """Espera a que el hilo escriba todas las filas encoladas hasta este momento."""
+        if not self._thread.is_alive():
+            self._write(self._drain())
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._write([row for row in self._drain() if isinstance(row, tuple)])
+
+    def _drain(self) -> List[Any]:
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _loop(self):
+        # En la cola conviven filas (tuplas), marcadores de flush (threading.Event)
+        # y None para detener el hilo.
+        while True:
+            item = self._queue.get()
+            rows, markers = [], []
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while True:
+                if item is None:
+                    self._write(rows)
+                    for marker in markers:
+                        marker.set()
+                    return
+                if isinstance(item, threading.Event):
+                    markers.append(item)
+                    break
+                rows.append(item)
+                remaining = deadline - time.monotonic()
+                if len(rows) >= self.MAX_BATCH or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(rows)
+            for marker in markers:
+                marker.set()
+
+    def _write(self, rows: List[tuple]):
+        if not rows:
+            return
+        try:
+            with DatabaseManager._transaction() as cursor:
+                cursor.executemany(self._query, rows)
+        except sqlite3.IntegrityError as e:
+            # Una fila inválida (p. ej. de un usuario ya borrado) no debe tirar el lote entero
+            logger.warning(f"Lote de {len(rows)} filas en '{self.table}' rechazado ({e}); se inserta fila a fila.")
+            self._write_one_by_one(rows)
+        except sqlite3.Error as e:
+            logger.error(f"Error en la base de datos al guardar {len(rows)} filas en '{self.table}': {e}")
+
+    def _write_one_by_one(self, rows: List[tuple]):
+        rejected = 0
+        try:
+            with DatabaseManager._transaction() as cursor:
+                for row in rows:
+                    try:
+                        cursor.execute(self._query, row)
+                    except sqlite3.IntegrityError:
+                        rejected += 1
+        except sqlite3.Error as e:
+            logger.error(f"Error en la base de datos al guardar {len(rows)} filas en '{self.table}': {e}")
+            return
+        if rejected:
+            logger.warning(f"{rejected} de {len(rows)} filas descartadas en '{self.table}' por violar restricciones.")
+
+
 class DatabaseManager:
     """
     Gestiona todas las operaciones de la base de datos SQLite para la aplicación.
@@ -14,6 +145,28 @@ class DatabaseManager:
     DATABASE_DIR = "database"
     DATABASE_FILE = os.path.join(DATABASE_DIR, "copiloto_id.db")
 
+    # Ajustes por conexión: fsync reducido (seguro con WAL), temporales en memoria,
+    # caché de ~64 MB, lectura mapeada en memoria de hasta 256 MB y espera ante bloqueos.
+    CONNECTION_PRAGMAS = (
+        "PRAGMA foreign_keys = ON;",
+        "PRAGMA synchronous = NORMAL;",
+        "PRAGMA temp_store = MEMORY;",
+        "PRAGMA cache_size = -64000;",
+        "PRAGMA mmap_size = 268435456;",
+        "PRAGMA busy_timeout = 5000;",
+    )
+
+    # Número de sentencias compiladas que cada conexión mantiene en caché
+    CACHED_STATEMENTS = 256
+
+    # Una conexión reutilizable por hilo (SQLite no comparte conexiones entre hilos de forma
+    # segura) y un cerrojo que serializa las escrituras de todos los hilos.
+    _local = threading.local()
+    _write_lock = threading.RLock()
+
+    # Escritor por lotes de registros_comportamiento (se crea con el primer evento)
+    _behavior_writer: Optional[_BatchWriter] = None
+
     def __init__(self):
         """
         Constructor simple. La inicialización se realiza explícitamente mediante
@@ -23,6 +176,64 @@ class DatabaseManager:
         # DatabaseManager.initialize_database()
         pass
 
+    @staticmethod
+    def _apply_pragmas(conn: sqlite3.Connection, set_journal_mode: bool = False):
+        """
+        Aplica los PRAGMA de rendimiento a una conexión recién abierta. El modo WAL es
+        persistente en el archivo, así que basta con fijarlo al inicializar la base de datos
+        (y no aplica a bases de datos en memoria).
+        """
+        if set_journal_mode and DatabaseManager.DATABASE_FILE != ':memory:':
+            mode = conn.execute("PRAGMA journal_mode = WAL;").fetchone()[0]
+            if mode.lower() != 'wal':
+                logger.warning(f"No se pudo activar el modo WAL en la base de datos (modo actual: {mode}).")
+        for pragma in DatabaseManager.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+
+    @staticmethod
+    def _get_connection() -> sqlite3.Connection:
+        """
+        Devuelve la conexión del hilo actual, abriéndola (con los PRAGMA aplicados) la
+        primera vez. Si DATABASE_FILE cambia, se cierra la anterior y se abre una nueva.
+        """
+        conn = getattr(DatabaseManager._local, 'conn', None)
+        if conn is not None and DatabaseManager._local.path == DatabaseManager.DATABASE_FILE:
+            return conn
+        if conn is not None:
+            conn.close()
+        # La caché de sentencias preparadas vive en la conexión; como esta se reutiliza,
+        # las consultas repetidas (inserciones de embeddings, eventos, logs) no se recompilan.
+        conn = sqlite3.connect(DatabaseManager.DATABASE_FILE, cached_statements=DatabaseManager.CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        DatabaseManager._apply_pragmas(conn)
+        DatabaseManager._local.conn = conn
+        DatabaseManager._local.path = DatabaseManager.DATABASE_FILE
+        return conn
+
+    @staticmethod
+    def close_connection():
+        """Cierra la conexión del hilo actual, si existe (p. ej. al terminar un hilo de trabajo)."""
+        conn = getattr(DatabaseManager._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            DatabaseManager._local.conn = None
+
+    @staticmethod
+    @contextmanager
+    def _transaction() -> Iterator[sqlite3.Cursor]:
+        """
+        Ejecuta un bloque de escrituras como una única transacción (un solo commit) sobre
+        la conexión del hilo actual, con el cerrojo de escritura tomado. Si el bloque lanza
+        una excepción se hace rollback y la excepción se propaga.
+        """
+        conn = DatabaseManager._get_connection()
+        with DatabaseManager._write_lock, conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
     @staticmethod
     def initialize_database():
         """
@@ -38,9 +249,9 @@ class DatabaseManager:
             raise
 
         try:
-            with sqlite3.connect(DatabaseManager.DATABASE_FILE) as conn:
-                cursor = conn.cursor()
-                cursor.execute("PRAGMA foreign_keys = ON;")
+            conn = DatabaseManager._get_connection()
+            DatabaseManager._apply_pragmas(conn, set_journal_mode=True)
+            with DatabaseManager._transaction() as cursor:
 
                 # --- Tabla de Usuarios ---
                 cursor.execute('''CREATE TABLE IF NOT EXISTS usuarios (
@@ -85,9 +296,19 @@ class DatabaseManager:
                                     metadata TEXT,
                                     FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
                                  )''')
-                
-                conn.commit()
-                logger.info("Base de datos inicializada/verificada correctamente.")
+
+                # --- Índices ---
+                # (usuario_id, fecha) sirve tanto para las búsquedas por usuario (incluidos los
+                # borrados en cascada) como para ordenar por fecha dentro de cada usuario.
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_emb_user_date ON embeddings_usuarios(usuario_id, fecha_captura)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_acc_user_date ON registros_acceso(usuario_id, fecha_hora DESC)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_comp_user_date ON registros_comportamiento(usuario_id, fecha_hora)")
+                # Solo fecha: consultas de todos los usuarios por rango (analíticas), que así
+                # recorren el rango ya ordenado en lugar de la tabla completa más un ordenamiento.
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_acc_date ON registros_acceso(fecha_hora)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_comp_date ON registros_comportamiento(fecha_hora)")
+
+            logger.info("Base de datos inicializada/verificada correctamente.")
 
         except sqlite3.Error as e:
             logger.critical(f"Error crítico al inicializar la base de datos: {e}")
@@ -95,23 +316,30 @@ class DatabaseManager:
 
     @staticmethod
     def _execute_query(query: str, params: tuple = (), fetch: Optional[str] = None) -> Any:
-        """Método de ayuda privado para ejecutar consultas de forma segura."""
+        """
+        Método de ayuda privado para ejecutar consultas de forma segura.
+        fetch: 'one' (dict o None), 'all' (lista de dicts), 'column' (lista con la primera
+        columna de cada fila, sin construir dicts) o None para escrituras (devuelve lastrowid).
+        """
         try:
-            with sqlite3.connect(DatabaseManager.DATABASE_FILE) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("PRAGMA foreign_keys = ON;")
-                cursor.execute(query, params)
-                
-                if fetch == 'one':
-                    result = cursor.fetchone()
-                    return dict(result) if result else None
-                if fetch == 'all':
-                    results = cursor.fetchall()
-                    return [dict(row) for row in results]
-                
-                conn.commit()
-                return cursor.lastrowid
+            conn = DatabaseManager._get_connection()
+            if fetch:
+                cursor = conn.execute(query, params)
+                try:
+                    if fetch == 'one':
+                        result = cursor.fetchone()
+                        return dict(result) if result else None
+                    if fetch == 'all':
+                        results = cursor.fetchall()
+                        return [dict(row) for row in results]
+                    if fetch == 'column':
+                        return [row[0] for row in cursor.fetchall()]
+                finally:
+                    cursor.close()  # Liberar la instantánea de lectura de la conexión compartida
+
+            with DatabaseManager._write_lock, conn:
+                cursor = conn.execute(query, params)
+            return cursor.lastrowid
         except sqlite3.Error as e:
             logger.error(f"Error en la base de datos: {e} | Query: {query} | Params: {params}")
             return None if fetch else False
@@ -120,22 +348,76 @@ class DatabaseManager:
 
     @staticmethod
     def register_user() -> Optional[Tuple[int, str]]:
-        last_id_result = DatabaseManager._execute_query("SELECT MAX(id) as max_id FROM usuarios", fetch='one')
-        next_id = (last_id_result['max_id'] or 0) + 1
-        user_code = f"USUARIO_{next_id:04d}"
-        
-        user_id = DatabaseManager._execute_query("INSERT INTO usuarios (codigo_usuario) VALUES (?)", (user_code,))
-        if user_id:
-            logger.info(f"Usuario '{user_code}' registrado con ID: {user_id}")
-            return user_id, user_code
-        return None
+        """
+        Crea un usuario nuevo en una sola transacción: SQLite asigna el id (AUTOINCREMENT)
+        y el código 'USUARIO_XXXX' se deriva de ese mismo id, sin consultar MAX(id) antes.
+        """
+        try:
+            with DatabaseManager._transaction() as cursor:
+                cursor.execute("INSERT INTO usuarios (codigo_usuario) VALUES (hex(randomblob(16)))")
+                user_id = cursor.lastrowid
+                user_code = f"USUARIO_{user_id:04d}"
+                cursor.execute("UPDATE usuarios SET codigo_usuario = ? WHERE id = ?", (user_code, user_id))
+        except sqlite3.Error as e:
+            logger.error(f"Error en la base de datos al registrar un usuario: {e}")
+            return None
+
+        logger.info(f"Usuario '{user_code}' registrado con ID: {user_id}")
+        return user_id, user_code
 
     @staticmethod
     def add_user_embedding(user_id: int, embedding: np.ndarray, image_path: str, model_name: str, pose: tuple):
-        embedding_blob = embedding.astype(np.float32).tobytes()
-        pitch, yaw, roll = pose
+        return DatabaseManager.add_user_embeddings(user_id, [(embedding, image_path, model_name, pose)])
+
+    @staticmethod
+    def add_user_embeddings(user_id: int, rows: List[Tuple[np.ndarray, str, str, tuple]]):
+        """
+        Inserta varios embeddings de un usuario con un único executemany en una sola transacción.
+
+        Args:
+            user_id (int): ID del usuario.
+            rows (list): Tuplas (embedding, ruta_imagen, nombre_modelo, (pitch, yaw, roll)).
+
+        Returns:
+            El rowid del último embedding insertado, o False si hubo un error.
+        """
+        params = [
+            (user_id, quantize_embedding(embedding), image_path, f"{model_name}{INT8_EMBEDDING_SUFFIX}", *pose)
+            for embedding, image_path, model_name, pose in rows
+        ]
+        if not params:
+            return None
         query = "INSERT INTO embeddings_usuarios (usuario_id, embedding, ruta_imagen_capturada, modelo_embedding, pitch, yaw, roll) VALUES (?, ?, ?, ?, ?, ?, ?)"
-        return DatabaseManager._execute_query(query, (user_id, embedding_blob, image_path, model_name, pitch, yaw, roll))
+        try:
+            with DatabaseManager._transaction() as cursor:
+                cursor.executemany(query, params)
+                return cursor.execute("SELECT last_insert_rowid()").fetchone()[0] if cursor.rowcount else None
+        except sqlite3.Error as e:
+            logger.error(f"Error en la base de datos al guardar {len(params)} embeddings del usuario {user_id}: {e}")
+            return False
+
+    @staticmethod
+    def get_all_user_embeddings(model_name: str) -> List[Dict]:
+        """
+        Obtiene todos los embeddings registrados para un modelo, ya decodificados a float32.
+        Acepta tanto el formato INT8 actual como los blobs float32 antiguos.
+
+        Returns:
+            Lista de diccionarios con 'user_id', 'codigo_usuario' y 'embedding'.
+        """
+        query = """
+            SELECT e.usuario_id AS user_id, u.codigo_usuario, e.embedding, e.modelo_embedding
+            FROM embeddings_usuarios e JOIN usuarios u ON e.usuario_id = u.id
+            WHERE e.modelo_embedding IN (?, ?)
+        """
+        rows = DatabaseManager._execute_query(query, (model_name, f"{model_name}{INT8_EMBEDDING_SUFFIX}"), fetch='all') or []
+        for row in rows:
+            blob = row.pop('embedding')
+            if row.pop('modelo_embedding').endswith(INT8_EMBEDDING_SUFFIX):
+                row['embedding'] = dequantize_embedding(blob)
+            else:
+                row['embedding'] = np.frombuffer(blob, dtype=np.float32)
+        return rows
 
     @staticmethod
     def get_user_details_for_list() -> List[Dict]:
@@ -153,9 +435,12 @@ class DatabaseManager:
     @staticmethod
     def delete_user(user_id: int) -> Tuple[bool, List[str]]:
         """Elimina un usuario y devuelve las rutas de sus imágenes para borrarlas del disco."""
-        image_paths_query = "SELECT ruta_imagen_capturada FROM embeddings_usuarios WHERE usuario_id = ?"
-        paths_result = DatabaseManager._execute_query(image_paths_query, (user_id,), fetch='all')
-        image_paths = [row['ruta_imagen_capturada'] for row in paths_result if row['ruta_imagen_capturada']]
+        # Escribir antes los eventos encolados: si quedasen en el escritor, sus filas
+        # referenciarían a un usuario inexistente
+        DatabaseManager.flush_behavior_events()
+        image_paths_query = "SELECT ruta_imagen_capturada FROM embeddings_usuarios WHERE usuario_id = ? AND ruta_imagen_capturada IS NOT NULL"
+        paths_result = DatabaseManager._execute_query(image_paths_query, (user_id,), fetch='column') or []
+        image_paths = [path for path in paths_result if path]
 
         delete_query = "DELETE FROM usuarios WHERE id = ?"
         success = DatabaseManager._execute_query(delete_query, (user_id,))
@@ -168,19 +453,64 @@ class DatabaseManager:
     @staticmethod
     def delete_all_users() -> Tuple[bool, List[str]]:
         """Elimina TODOS los usuarios y devuelve todas las rutas de imágenes."""
-        image_paths_query = "SELECT ruta_imagen_capturada FROM embeddings_usuarios"
-        paths_result = DatabaseManager._execute_query(image_paths_query, fetch='all')
-        image_paths = [row['ruta_imagen_capturada'] for row in paths_result if row['ruta_imagen_capturada']]
-
-        DatabaseManager._execute_query("DELETE FROM registros_comportamiento")
-        DatabaseManager._execute_query("DELETE FROM registros_acceso")
-        DatabaseManager._execute_query("DELETE FROM embeddings_usuarios")
-        DatabaseManager._execute_query("DELETE FROM usuarios")
-        DatabaseManager._execute_query("DELETE FROM sqlite_sequence") # Resetea contadores de autoincremento
+        DatabaseManager.flush_behavior_events()
+        try:
+            with DatabaseManager._transaction() as cursor:
+                cursor.execute("SELECT ruta_imagen_capturada FROM embeddings_usuarios WHERE ruta_imagen_capturada IS NOT NULL")
+                image_paths = [row[0] for row in cursor.fetchall() if row[0]]
+
+                cursor.execute("DELETE FROM registros_comportamiento")
+                cursor.execute("DELETE FROM registros_acceso")
+                cursor.execute("DELETE FROM embeddings_usuarios")
+                cursor.execute("DELETE FROM usuarios")
+                cursor.execute("DELETE FROM sqlite_sequence") # Resetea contadores de autoincremento
+        except sqlite3.Error as e:
+            logger.error(f"Error en la base de datos al limpiar todas las tablas: {e}")
+            return False, []
+
         logger.info("Todas las tablas de usuarios y registros han sido limpiadas.")
         return True, image_paths
 
-    # ... (resto de funciones como save_calibration_data, load_calibration_data, get_behavioral_events, etc. se mantienen como las definimos) ...
+    @staticmethod
+    def log_behavior_event(user_id: Optional[int], event_type: str, duration_sec: Optional[float] = None, metadata: Optional[str] = None):
+        """
+        Registra un evento de comportamiento (fatiga, distracción, etc.). La inserción se
+        encola y la realiza el escritor por lotes; la fecha se toma en el momento de la llamada.
+        """
+        if DatabaseManager._behavior_writer is None:
+            with DatabaseManager._write_lock:
+                if DatabaseManager._behavior_writer is None:
+                    DatabaseManager._behavior_writer = _BatchWriter(
+                        "registros_comportamiento",
+                        ("usuario_id", "fecha_hora", "tipo_evento", "duracion_seg", "metadata")
+                    )
+        # Mismo formato (UTC) que el DEFAULT CURRENT_TIMESTAMP de la tabla
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        DatabaseManager._behavior_writer.enqueue((user_id, timestamp, event_type, duration_sec, metadata))
+
+    @staticmethod
+    def flush_behavior_events():
+        """Fuerza la escritura de los eventos de comportamiento pendientes."""
+        if DatabaseManager._behavior_writer is not None:
+            DatabaseManager._behavior_writer.flush()
+
+    # ... (resto de funciones como save_calibration_data, load_calibration_data, etc. se mantienen como las definimos) ...
+
+    @staticmethod
+    def _append_date_range(column: str, start_date: Optional[str], end_date: Optional[str],
+                           conditions: List[str], params: List[Any]):
+        """
+        Añade un filtro de fechas inclusivo ('YYYY-MM-DD') comparando la columna directamente
+        (start <= col < end + 1 día), de modo que SQLite pueda usar los índices sobre la fecha
+        (idx_*_date para todos los usuarios, idx_*_user_date con un usuario concreto) en
+        lugar de evaluar date() en cada fila.
+        """
+        if start_date:
+            conditions.append(f"{column} >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append(f"{column} < date(?, '+1 day')")
+            params.append(end_date)
 
     @staticmethod
     def get_access_logs(user_id: int = None, start_date: str = None, end_date: str = None) -> List[Dict]:
@@ -190,15 +520,52 @@ class DatabaseManager:
         if user_id and user_id > 0:
             conditions.append("a.usuario_id = ?")
             params.append(user_id)
-        if start_date:
-            conditions.append("date(a.fecha_hora) >= ?")
-            params.append(start_date)
-        if end_date:
-            conditions.append("date(a.fecha_hora) <= ?")
-            params.append(end_date)
+        DatabaseManager._append_date_range("a.fecha_hora", start_date, end_date, conditions, params)
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
         query += " ORDER BY a.fecha_hora DESC"
         
         rows = DatabaseManager._execute_query(query, tuple(params), fetch='all')
-        return rows if rows else []
\ No newline at end of file
+        return rows if rows else []
+    @staticmethod
+    def get_behavioral_events_iter(user_id: int = None, start_date: str = None, end_date: str = None,
+                                   chunk_size: int = 5000) -> Iterator[List[Dict]]:
+        """
+        Recorre los eventos de comportamiento con filtros opcionales, en bloques de
+        'chunk_size' filas (lista de dicts por bloque), más recientes primero.
+        Permite procesar cada bloque mientras se lee el siguiente.
+        """
+        # Los eventos aún en la cola del escritor por lotes también deben aparecer
+        DatabaseManager.flush_behavior_events()
+
+        query = ("SELECT b.fecha_hora, b.tipo_evento, b.duracion_seg, u.codigo_usuario "
+                 "FROM registros_comportamiento b LEFT JOIN usuarios u ON b.usuario_id = u.id")
+        conditions, params = [], []
+        if user_id and user_id > 0:
+            conditions.append("b.usuario_id = ?")
+            params.append(user_id)
+        DatabaseManager._append_date_range("b.fecha_hora", start_date, end_date, conditions, params)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY b.fecha_hora DESC"
+
+        # Conexión propia del hilo que itera (las conexiones son por hilo)
+        cursor = DatabaseManager._get_connection().execute(query, tuple(params))
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+        finally:
+            cursor.close()  # Liberar la instantánea de lectura aunque el consumidor pare antes
+
+    @staticmethod
+    def get_behavioral_events(user_id: int = None, start_date: str = None, end_date: str = None) -> List[Dict]:
+        """Obtiene los eventos de comportamiento (fatiga, distracción, etc.) con filtros opcionales."""
+        try:
+            return [event for chunk in DatabaseManager.get_behavioral_events_iter(user_id, start_date, end_date)
+                    for event in chunk]
+        except sqlite3.Error as e:
+            logger.error(f"Error en la base de datos al obtener eventos de comportamiento: {e}")
+            return []
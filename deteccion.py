@@ -7,6 +7,14 @@ from typing import Tuple, Optional, List, Dict, Any
 import mediapipe as mp
 from logging_setup import logger
 
+# Numba es opcional: si está instalado, el test de proximidad mano-ojo se compila a código
+# nativo; si no, se usa la versión vectorizada con NumPy.
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # --- Funciones de Cálculo Geométrico ---
 
 def calculate_angle(a: List[float], b: List[float], c: List[float]) -> float:
@@ -14,24 +22,16 @@ def calculate_angle(a: List[float], b: List[float], c: List[float]) -> float:
     Calcula el ángulo (en grados) entre tres puntos 2D.
     El signo del ángulo indica la dirección de la rotación.
     """
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    
-    # Vectores BA y BC
-    ba = a - b
-    bc = c - b
+    # Vectores BA y BC (aritmética escalar: para vectores 2D es más rápida que NumPy)
+    bax, bay = a[0] - b[0], a[1] - b[1]
+    bcx, bcy = c[0] - b[0], c[1] - b[1]
     
     # Producto punto y cruzado
-    dot_product = np.dot(ba, bc)
-    cross_product = np.cross(ba, bc)
-    
-    # Ángulo en radianes
-    angle_rad = np.arctan2(cross_product, dot_product)
+    dot_product = bax * bcx + bay * bcy
+    cross_product = bax * bcy - bay * bcx
     
-    # Convertir a grados
-    angle_deg = np.degrees(angle_rad)
-    return angle_deg
+    # Ángulo en radianes, convertido a grados
+    return math.degrees(math.atan2(cross_product, dot_product))
 
 def calculate_head_angle(face_landmarks: Any) -> Tuple[Optional[float], Optional[float]]:
     """
@@ -71,6 +71,39 @@ def calculate_head_angle(face_landmarks: Any) -> Tuple[Optional[float], Optional
 
 # --- Funciones de Detección de Eventos Específicos ---
 
+# Índices de landmarks de MediaPipe resueltos una sola vez al importar el módulo.
+# Puntos clave de las manos usados para detectar el frotamiento de ojos (puntas de los dedos)
+KEY_HAND_POINTS = (int(mp.solutions.hands.HandLandmark.THUMB_TIP),
+                   int(mp.solutions.hands.HandLandmark.INDEX_FINGER_TIP),
+                   int(mp.solutions.hands.HandLandmark.MIDDLE_FINGER_TIP))
+
+# Hombros, codos y muñecas para detectar estiramientos
+_POSE = mp.solutions.pose.PoseLandmark
+LEFT_SHOULDER, RIGHT_SHOULDER = int(_POSE.LEFT_SHOULDER), int(_POSE.RIGHT_SHOULDER)
+LEFT_ELBOW, RIGHT_ELBOW = int(_POSE.LEFT_ELBOW), int(_POSE.RIGHT_ELBOW)
+LEFT_WRIST, RIGHT_WRIST = int(_POSE.LEFT_WRIST), int(_POSE.RIGHT_WRIST)
+
+def _eye_rub_mask(points: np.ndarray, left_x: float, left_y: float,
+                  right_x: float, right_y: float, radius: float) -> int:
+    """
+    Máscara de proximidad de las puntas de los dedos a los ojos:
+    bit 0 = ojo izquierdo, bit 1 = ojo derecho (coincide con el código de detect_eye_rubbing).
+    """
+    r2 = radius * radius
+    mask = 0
+    for k in range(points.shape[0]):
+        x = points[k, 0]
+        y = points[k, 1]
+        if (x - left_x) ** 2 + (y - left_y) ** 2 < r2:
+            mask |= 1
+        if (x - right_x) ** 2 + (y - right_y) ** 2 < r2:
+            mask |= 2
+    return mask
+
+if NUMBA_AVAILABLE:
+    _eye_rub_mask = njit(cache=True, fastmath=True)(_eye_rub_mask)
+    _eye_rub_mask(np.zeros((1, 2)), 0.0, 0.0, 0.0, 0.0, 1.0)  # Compilar al importar, no en el primer frame
+
 def detect_eye_rubbing(face_landmarks: np.ndarray, hand_landmarks: Any, config: Dict) -> int:
     """
     Detecta si una o ambas manos están cerca de los ojos.
@@ -98,24 +131,23 @@ def detect_eye_rubbing(face_landmarks: np.ndarray, hand_landmarks: Any, config:
         eye_dist = np.linalg.norm(left_eye_center - right_eye_center)
         detection_radius = eye_dist * 0.7  # Umbral de proximidad
 
-        # Puntos clave de las manos (puntas de los dedos)
-        key_hand_points = [mp.solutions.hands.HandLandmark.THUMB_TIP, 
-                           mp.solutions.hands.HandLandmark.INDEX_FINGER_TIP,
-                           mp.solutions.hands.HandLandmark.MIDDLE_FINGER_TIP]
-        
-        left_eye_rub = False
-        right_eye_rub = False
-
-        for hand_lms in hand_landmarks.multi_hand_landmarks:
-            for point_idx in key_hand_points:
-                hand_point = hand_lms.landmark[point_idx]
-                hx, hy = int(hand_point.x * frame_width), int(hand_point.y * frame_height)
-                
-                # Comprobar proximidad con cada ojo
-                if np.linalg.norm([hx - left_eye_center[0], hy - left_eye_center[1]]) < detection_radius:
-                    left_eye_rub = True
-                if np.linalg.norm([hx - right_eye_center[0], hy - right_eye_center[1]]) < detection_radius:
-                    right_eye_rub = True
+        # Puntas de los dedos de todas las manos en píxeles, en un único array (H*3, 2)
+        hand_points = np.array([
+            (hand_lms.landmark[point_idx].x, hand_lms.landmark[point_idx].y)
+            for hand_lms in hand_landmarks.multi_hand_landmarks
+            for point_idx in KEY_HAND_POINTS
+        ])
+        hand_points = np.trunc(hand_points * (frame_width, frame_height))
+
+        if NUMBA_AVAILABLE:
+            mask = _eye_rub_mask(hand_points, float(left_eye_center[0]), float(left_eye_center[1]),
+                                 float(right_eye_center[0]), float(right_eye_center[1]), float(detection_radius))
+            left_eye_rub, right_eye_rub = bool(mask & 1), bool(mask & 2)
+        else:
+            # Distancia de cada punta a cada ojo: (H*3, 2) frente a los dos centros -> (H*3, 2)
+            eye_centers = np.stack((left_eye_center[:2], right_eye_center[:2]))
+            dists = np.linalg.norm(hand_points[:, None, :] - eye_centers[None, :, :], axis=2)
+            left_eye_rub, right_eye_rub = (dists < detection_radius).any(axis=0)
         
         if left_eye_rub and right_eye_rub:
             return 3  # Ambos ojos
@@ -152,12 +184,12 @@ def detect_stretching(pose_landmarks: Any, config: Dict) -> bool:
         landmarks = pose_landmarks.landmark
         
         # Puntos clave para brazos y hombros
-        left_shoulder = landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER]
-        left_elbow = landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW]
-        right_elbow = landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ELBOW]
-        left_wrist = landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST]
-        right_wrist = landmarks[mp.solutions.pose.PoseLandmark.RIGHT_WRIST]
+        left_shoulder = landmarks[LEFT_SHOULDER]
+        right_shoulder = landmarks[RIGHT_SHOULDER]
+        left_elbow = landmarks[LEFT_ELBOW]
+        right_elbow = landmarks[RIGHT_ELBOW]
+        left_wrist = landmarks[LEFT_WRIST]
+        right_wrist = landmarks[RIGHT_WRIST]
 
         # Condición 1: Al menos una muñeca debe estar por encima de su hombro
         left_wrist_above_shoulder = left_wrist.y < left_shoulder.y
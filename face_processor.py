@@ -1,6 +1,7 @@
 # face_processor.py
 
 import cv2
+import concurrent.futures
 import mediapipe as mp
 import numpy as np
 import onnxruntime as ort
@@ -10,6 +11,21 @@ from typing import Tuple, Any, Optional, List, Dict
 from logging_setup import logger
 from config_manager import ConfigManager
 
+# Landmarks de MediaPipe usados para alinear el rostro: ojo izq. (esquina izq.), ojo der.
+# (esquina der.), punta de la nariz, comisuras izq. y der. de la boca
+ALIGN_SRC_IDX = (33, 263, 1, 61, 291)
+# Los mismos puntos tal como los etiquetaba MediaPipe sobre el frame en espejo, con el que
+# se registraron los perfiles: izquierda y derecha intercambiadas
+ALIGN_SRC_IDX_MIRRORED = (263, 33, 1, 291, 61)
+
+# Puntos de destino estándar (plantilla ArcFace) para un chip de 112x112
+ARCFACE_DST_PTS = np.array([
+    [30.2946, 51.6963], [65.5318, 51.5014],
+    [48.0252, 71.7366], [33.5493, 92.3655],
+    [62.7299, 92.2041]
+], dtype=np.float32)
+ARCFACE_DST_PTS.flags.writeable = False
+
 class EmbeddingModel:
     """Clase interna para cargar y usar el modelo de embedding facial ONNX."""
     def __init__(self, config: Dict):
@@ -17,6 +33,11 @@ class EmbeddingModel:
         self.ort_session: Optional[ort.InferenceSession] = None
         self.input_name: Optional[str] = None
         self.output_name: Optional[str] = None
+
+        # Buffers preasignados de entrada/salida enlazados al modelo (IOBinding)
+        self._io_binding = None
+        self._input_buf: Optional[np.ndarray] = None
+        self._output_buf: Optional[np.ndarray] = None
         
         rec_settings = config.get('recognition_settings', {})
         model_filename = rec_settings.get('model_filename')
@@ -40,31 +61,99 @@ class EmbeddingModel:
 
             logger.info(f"Modelo ONNX '{model_filename}' cargado exitosamente usando {providers[0]}.")
             self.initialized = True
+            self._setup_io_binding()
 
         except Exception as e:
             logger.critical(f"Error fatal al cargar el modelo ONNX '{model_filename}': {e}", exc_info=True)
             self.initialized = False
 
+    def _setup_io_binding(self):
+        """
+        Enlaza buffers de entrada (1x3x112x112) y salida preasignados a la sesión para que
+        ONNX Runtime lea y escriba directamente en ellos en cada inferencia. Si el modelo
+        tiene dimensiones de salida no fijas o el enlace falla, se usa session.run().
+        """
+        try:
+            output_shape = self.ort_session.get_outputs()[0].shape
+            output_shape = [1] + list(output_shape[1:])  # Lote de un solo rostro
+            if not all(isinstance(d, int) and d > 0 for d in output_shape):
+                logger.info(f"Salida del modelo con dimensiones dinámicas {output_shape}; no se usa IOBinding.")
+                return
+
+            self._input_buf = np.empty((1, 3, 112, 112), dtype=np.float32)
+            self._output_buf = np.empty(output_shape, dtype=np.float32)
+            self._io_binding = self.ort_session.io_binding()
+            self._io_binding.bind_cpu_input(self.input_name, self._input_buf)
+            self._io_binding.bind_output(self.output_name, 'cpu', 0, np.float32, output_shape,
+                                         self._output_buf.ctypes.data)
+        except Exception as e:
+            logger.warning(f"No se pudo configurar IOBinding; se usará session.run(): {e}")
+            self._io_binding = None
+
     def get_face_embedding(self, preprocessed_blob: np.ndarray) -> Optional[np.ndarray]:
         """Genera el vector de embedding a partir de un blob preprocesado."""
         if not self.initialized or self.ort_session is None:
             return None
         try:
-            embedding_raw = self.ort_session.run([self.output_name], {self.input_name: preprocessed_blob})[0]
-            embedding = np.array(embedding_raw, dtype=np.float32).flatten()
+            if self._io_binding is not None and preprocessed_blob.shape == self._input_buf.shape:
+                np.copyto(self._input_buf, preprocessed_blob)
+                self.ort_session.run_with_iobinding(self._io_binding)
+                embedding = self._output_buf.ravel()  # Vista del buffer; la normalización crea la copia
+            else:
+                embedding_raw = self.ort_session.run([self.output_name], {self.input_name: preprocessed_blob})[0]
+                embedding = np.array(embedding_raw, dtype=np.float32).flatten()
             
             # Normalizar el vector de embedding (norma L2)
             norm = np.linalg.norm(embedding)
-            return embedding / norm if norm > 1e-6 else embedding
+            return embedding / norm if norm > 1e-6 else embedding.copy()
         except Exception as e:
             logger.error(f"Error al generar embedding con ONNX Runtime: {e}", exc_info=True)
             return None
 
 class FaceProcessor:
     """Orquesta el procesamiento facial: detección, alineación y extracción de embeddings."""
+    # Compuerta de presencia: tras PRESENCE_GATE_AFTER_FRAMES frames seguidos sin rostro en
+    # Face Mesh, un detector barato sobre el frame reducido decide si merece la pena ejecutar
+    # MediaPipe. Cada PRESENCE_GATE_MAX_SKIP frames omitidos se fuerza una pasada completa
+    # por si el detector barato falla (p. ej. con la cabeza girada).
+    PRESENCE_GATE_SIZE = (160, 120)
+    PRESENCE_GATE_AFTER_FRAMES = 30
+    PRESENCE_GATE_MAX_SKIP = 10
+    YUNET_MODEL_FILENAME = "face_detection_yunet.onnx"
+
     def __init__(self, config: Dict):
         self.config = config
         self.initialized = False
+
+        # Matriz (N, D) de embeddings conocidos y sus metadatos, alineados por fila
+        self.known_matrix: Optional[np.ndarray] = None
+        self.known_meta: List[Dict] = []
+        self._known_source: Optional[List[Dict]] = None
+
+        # Buffer NCHW reutilizado para el blob de entrada del modelo (chip fijo de 112x112)
+        self._blob_buf = np.empty((1, 3, 112, 112), dtype=np.float32)
+
+        # Buffer RGB compartido por los tres detectores de MediaPipe y buffer del frame
+        # reducido a 'mediapipe_max_width' de ancho (0 = resolución de la cámara)
+        self._rgb_buf: Optional[np.ndarray] = None
+        self._scaled_buf: Optional[np.ndarray] = None
+        self._mp_max_width = config.get('performance', {}).get('mediapipe_max_width', 640)
+
+        # Compuerta de presencia (YuNet si el modelo está en models/, si no Haar, o ninguna)
+        self._gate = None
+        self._gate_is_yunet = False
+        self._gate_buf: Optional[np.ndarray] = None
+        self._no_face_frames = 0
+        self._gate_skipped = 0
+        if config.get('performance', {}).get('face_presence_gate', True):
+            self._init_presence_gate()
+
+        # Un hilo dedicado por detector: los tres corren en paralelo sobre el mismo frame
+        # (MediaPipe libera el GIL) y cada grafo siempre se ejecuta en el mismo hilo.
+        self._solver_pools = {
+            name: concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'mp-{name}')
+            for name in ('face', 'hands', 'pose')
+        }
         
         try:
             # Inicializar Face Mesh
@@ -106,13 +195,84 @@ class FaceProcessor:
             logger.critical(f"Error al inicializar FaceProcessor: {e}", exc_info=True)
             self.initialized = False
             
+    def _init_presence_gate(self):
+        """Carga el detector barato de la compuerta de presencia; sin él se ejecuta MediaPipe en todos los frames."""
+        yunet_path = Path(__file__).parent / "models" / self.YUNET_MODEL_FILENAME
+        try:
+            if yunet_path.exists() and hasattr(cv2, 'FaceDetectorYN_create'):
+                self._gate = cv2.FaceDetectorYN_create(str(yunet_path), "", self.PRESENCE_GATE_SIZE, 0.6)
+                self._gate_is_yunet = True
+            elif hasattr(cv2, 'data'):
+                cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+                if not cascade.empty():
+                    self._gate = cascade
+        except cv2.error as e:
+            logger.warning(f"No se pudo cargar el detector de la compuerta de presencia: {e}")
+            self._gate = None
+        if self._gate is not None:
+            logger.info(f"Compuerta de presencia facial activa ({'YuNet' if self._gate_is_yunet else 'Haar'}).")
+
+    def _face_present(self, frame_bgr: np.ndarray) -> bool:
+        """Detección rápida sobre el frame reducido a PRESENCE_GATE_SIZE: True si parece haber un rostro."""
+        if self._gate_buf is None:
+            self._gate_buf = np.empty((self.PRESENCE_GATE_SIZE[1], self.PRESENCE_GATE_SIZE[0], 3), dtype=np.uint8)
+        small = cv2.resize(frame_bgr, self.PRESENCE_GATE_SIZE, dst=self._gate_buf, interpolation=cv2.INTER_AREA)
+        if self._gate_is_yunet:
+            _, faces = self._gate.detect(small)
+            return faces is not None and len(faces) > 0
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return len(self._gate.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(20, 20))) > 0
+
+    def _to_rgb(self, frame_bgr: np.ndarray) -> np.ndarray:
+        """
+        Prepara el frame para MediaPipe: si es más ancho que 'mediapipe_max_width' se reduce
+        una sola vez (manteniendo la proporción) y se convierte a RGB en un buffer reutilizado
+        que comparten los tres detectores (se reasigna solo si cambia la forma). Los landmarks
+        de MediaPipe están normalizados, así que no dependen de la resolución de entrada.
+        El buffer devuelto es de solo lectura.
+        """
+        h, w = frame_bgr.shape[:2]
+        if 0 < self._mp_max_width < w:
+            size = (self._mp_max_width, max(1, round(h * self._mp_max_width / w)))
+            if self._scaled_buf is None or self._scaled_buf.shape[1::-1] != size:
+                self._scaled_buf = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            frame_bgr = cv2.resize(frame_bgr, size, dst=self._scaled_buf, interpolation=cv2.INTER_AREA)
+        if self._rgb_buf is None or self._rgb_buf.shape != frame_bgr.shape:
+            self._rgb_buf = np.empty_like(frame_bgr)
+        self._rgb_buf.flags.writeable = True
+        cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+        self._rgb_buf.flags.writeable = False # Optimización: pasar el frame como de solo lectura
+        return self._rgb_buf
+
     def process_frame_for_landmarks(self, frame_bgr: np.ndarray) -> Optional[Any]:
         """Procesa un frame BGR para detectar landmarks faciales."""
-        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        frame_rgb.flags.writeable = False # Optimización: pasar el frame como de solo lectura
-        results = self.face_mesh.process(frame_rgb)
-        frame_rgb.flags.writeable = True
-        return results
+        return self._solver_pools['face'].submit(self.face_mesh.process, self._to_rgb(frame_bgr)).result()
+
+    def process_all(self, frame_bgr: np.ndarray) -> Tuple[Any, Any, Any]:
+        """
+        Ejecuta Face Mesh, Hands y Pose en paralelo sobre un único frame RGB compartido
+        (una sola conversión de color por frame) y espera a los tres resultados.
+
+        Si la escena lleva un tiempo sin rostro y la compuerta de presencia tampoco lo ve,
+        se omite MediaPipe y se devuelve (None, None, None).
+
+        Returns:
+            Una tupla (face_results, hand_results, pose_results).
+        """
+        if self._gate is not None and self._no_face_frames >= self.PRESENCE_GATE_AFTER_FRAMES:
+            if self._gate_skipped < self.PRESENCE_GATE_MAX_SKIP and not self._face_present(frame_bgr):
+                self._gate_skipped += 1
+                return None, None, None
+            self._gate_skipped = 0
+
+        frame_rgb = self._to_rgb(frame_bgr)
+        face_future = self._solver_pools['face'].submit(self.face_mesh.process, frame_rgb)
+        hands_future = self._solver_pools['hands'].submit(self.hands.process, frame_rgb)
+        pose_future = self._solver_pools['pose'].submit(self.pose.process, frame_rgb)
+        face_results = face_future.result()
+        # Cualquier detección de Face Mesh desactiva la compuerta de inmediato
+        self._no_face_frames = 0 if face_results.multi_face_landmarks else self._no_face_frames + 1
+        return face_results, hands_future.result(), pose_future.result()
 
     def draw_face_mesh(self, frame: np.ndarray, face_landmarks: Any) -> np.ndarray:
         """Dibuja la malla facial sobre un frame para visualización."""
@@ -127,46 +287,46 @@ class FaceProcessor:
 
     def align_face(self, frame_bgr: np.ndarray, face_landmarks: Any) -> Optional[Tuple[np.ndarray, np.ndarray]]:
         """
-        Extrae y alinea un "chip" facial a partir de los landmarks.
+        Extrae y alinea un "chip" facial a partir de los landmarks de MediaPipe.
         Devuelve el blob preprocesado para el modelo y la imagen alineada para guardar.
+        El blob es un buffer reutilizado: debe consumirse antes de volver a llamar a este método.
         """
         h, w, _ = frame_bgr.shape
-        lm = face_landmarks.landmark
 
         try:
-            # Puntos de referencia estándar para la alineación facial
-            src_pts = np.array([
-                (lm[33].x*w, lm[33].y*h),   # Ojo izquierdo, esquina izq.
-                (lm[263].x*w, lm[263].y*h), # Ojo derecho, esquina der.
-                (lm[1].x*w, lm[1].y*h),     # Punta de la nariz
-                (lm[61].x*w, lm[61].y*h),    # Comisura de la boca izq.
-                (lm[291].x*w, lm[291].y*h)   # Comisura de la boca der.
-            ], dtype=np.float32)
+            # Puntos en coordenadas del frame en espejo (x -> w-1-x, pares izq./der. intercambiados)
+            lm = face_landmarks.landmark
+            src_pts = np.empty((5, 2), dtype=np.float32)
+            for k, i in enumerate(ALIGN_SRC_IDX_MIRRORED):
+                point = lm[i]
+                src_pts[k, 0] = point.x * w
+                src_pts[k, 1] = point.y * h
+            src_pts[:, 0] = (w - 1) - src_pts[:, 0]
         except IndexError:
             logger.error("Error de índice al acceder a landmarks para alinear rostro.")
             return None
 
-        # Puntos de destino estándar para un chip de 112x112
-        dst_pts = np.array([
-            [30.2946, 51.6963], [65.5318, 51.5014],
-            [48.0252, 71.7366], [33.5493, 92.3655],
-            [62.7299, 92.2041]
-        ], dtype=np.float32)
-
         # Calcular la matriz de transformación afín
-        transform_matrix, _ = cv2.estimateAffinePartial2D(src_pts, dst_pts)
+        transform_matrix, _ = cv2.estimateAffinePartial2D(src_pts, ARCFACE_DST_PTS)
         if transform_matrix is None:
             logger.warning("No se pudo estimar la transformación afín para alinear el rostro.")
             return None
 
+        # Los perfiles registrados se alinearon sobre frames en espejo (el espejo se aplicaba en
+        # la captura). Componer la transformación con la reflexión [[-1, 0, w-1], [0, 1, 0]]
+        # produce sobre el frame sin espejo exactamente el mismo chip que entonces.
+        transform_matrix[:, 2] += transform_matrix[:, 0] * (w - 1)
+        transform_matrix[:, 0] *= -1
+
         # Aplicar la transformación para obtener la cara alineada
         input_size = (112, 112) # El tamaño que espera el modelo ONNX
         aligned_face = cv2.warpAffine(frame_bgr, transform_matrix, input_size)
         
-        # Preprocesar la imagen para el modelo ONNX (normalización BGR, rango -1 a 1)
-        blob = cv2.dnn.blobFromImage(
-            aligned_face, scalefactor=1./127.5, size=input_size, mean=(127.5, 127.5, 127.5), swapRB=True
-        )
+        # Preprocesar la imagen para el modelo ONNX (BGR->RGB, NCHW, rango -1 a 1) escribiendo
+        # directamente en el buffer preasignado. El blob devuelto se sobrescribe en la siguiente llamada.
+        blob = self._blob_buf
+        np.subtract(aligned_face[:, :, ::-1].transpose(2, 0, 1), 127.5, out=blob[0], dtype=np.float32)
+        blob *= 1. / 127.5
         return blob, aligned_face
 
     def get_embedding(self, aligned_blob: np.ndarray) -> Optional[np.ndarray]:
@@ -179,36 +339,57 @@ class FaceProcessor:
         if emb1 is None or emb2 is None: return 0.0
         return float(np.dot(emb1, emb2))
 
-    def find_match(self, query_emb: np.ndarray, known_embs_data: List[Dict], threshold: float) -> Tuple[Optional[Dict], float]:
+    def set_known_embeddings(self, known_embs_data: List[Dict]):
+        """
+        Apila los embeddings conocidos en una matriz contigua (N, D) float32 para que
+        find_match los compare todos con un único producto matriz-vector.
+
+        Args:
+            known_embs_data: Lista de diccionarios, cada uno con 'user_id', 'codigo_usuario', y 'embedding'.
+        """
+        self._known_source = known_embs_data
+        self.known_meta = list(known_embs_data or [])
+        if self.known_meta:
+            self.known_matrix = np.ascontiguousarray(
+                np.stack([user_data['embedding'] for user_data in self.known_meta]), dtype=np.float32
+            )
+        else:
+            self.known_matrix = None
+
+    def find_match(self, query_emb: np.ndarray, known_embs_data: Optional[List[Dict]], threshold: float) -> Tuple[Optional[Dict], float]:
         """
         Busca el rostro más similar en una lista de embeddings conocidos.
 
         Args:
             query_emb: El embedding del rostro a buscar.
             known_embs_data: Lista de diccionarios, cada uno con 'user_id', 'codigo_usuario', y 'embedding'.
+                             Si es None se usan los cargados con set_known_embeddings(); si es una
+                             lista distinta de la última usada, la matriz se reconstruye.
             threshold: El umbral de similitud para considerar una coincidencia.
 
         Returns:
             Una tupla (diccionario_del_usuario_coincidente, similitud_máxima).
         """
-        if query_emb is None or not known_embs_data:
-            return None, 0.0
+        if known_embs_data is not None and known_embs_data is not self._known_source:
+            self.set_known_embeddings(known_embs_data)
 
-        best_match_user_data = None
-        highest_similarity = -1.0
+        if query_emb is None or self.known_matrix is None:
+            return None, 0.0
 
-        for user_data in known_embs_data:
-            similarity = self.compare_embeddings(query_emb, user_data['embedding'])
-            if similarity > highest_similarity:
-                highest_similarity = similarity
-                if similarity >= threshold:
-                    best_match_user_data = user_data
+        # Los embeddings están normalizados (L2): la similitud de coseno es el producto punto
+        sims = self.known_matrix @ np.asarray(query_emb, dtype=np.float32)
+        idx = int(sims.argmax())
+        highest_similarity = float(sims[idx])
+        best_match_user_data = self.known_meta[idx] if highest_similarity >= threshold else None
         
         return best_match_user_data, highest_similarity
 
 
     def close(self):
         """Libera los recursos de MediaPipe."""
+        for pool in self._solver_pools.values():
+            pool.shutdown(wait=True)
+
         if hasattr(self, 'face_mesh'):
             self.face_mesh.close()
             logger.info("Recursos de MediaPipe Face Mesh liberados.")
@@ -23,6 +23,14 @@ except ImportError:
     logger = logging.getLogger(__name__)
     logging.basicConfig(level=logging.INFO)
 
+# Numba es opcional: si está instalado, las métricas faciales se calculan con un kernel
+# compilado; si no, con la versión vectorizada de NumPy.
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Importar módulos locales
 from nod_detector import NodDetector
 from deteccion import (
@@ -31,11 +39,82 @@ from deteccion import (
     detect_stretching
 )
 
+# Índices de landmarks de Face Mesh usados por las métricas faciales, concatenados para
+# extraerlos con una sola indexación: ojo izq. (6), ojo der. (6), boca (4), iris der. (5), iris izq. (5).
+_FACE_IDX = np.array([
+    362, 385, 387, 263, 373, 380,
+    33, 160, 158, 133, 153, 144,
+    61, 291, 0, 17,
+    473, 474, 475, 476, 477,
+    468, 469, 470, 471, 472,
+], dtype=np.intp)
+_NUM_POINTS_NO_IRIS = 16  # Ojos y boca
+# Con refine_landmarks=False Face Mesh no entrega los landmarks de iris (índices >= 468)
+_NUM_LANDMARKS_WITH_IRIS = int(_FACE_IDX.max()) + 1
+
+# Pares de puntos (sobre el array reunido con _FACE_IDX) cuyas distancias se calculan
+# juntas:
+#   0-2: ojo izq. (vertical 1, vertical 2, horizontal)   3-5: ojo der. (ídem)
+#   6-7: boca (ancho, alto)
+#   8-9: iris der. (diámetro horizontal, vertical)      10-11: iris izq. (ídem)
+_PAIR_A = np.array([1, 2, 0, 7, 8, 6, 12, 14, 18, 17, 23, 22], dtype=np.intp)
+_PAIR_B = np.array([5, 4, 3, 11, 10, 9, 13, 15, 20, 19, 25, 24], dtype=np.intp)
+_NUM_PAIRS_NO_IRIS = 8
+# Los mismos pares como tuplas de Python para el cálculo escalar sin Numba
+_PAIRS = tuple(zip(_PAIR_A.tolist(), _PAIR_B.tolist()))
+
+
+def _circularity(horizontal_radius: float, vertical_radius: float) -> float:
+    """Circularidad (0-1) de la elipse del iris, con el perímetro aproximado de Ramanujan."""
+    if horizontal_radius < 1e-6 or vertical_radius < 1e-6: return 0.0
+    area = math.pi * horizontal_radius * vertical_radius
+    a, b = horizontal_radius, vertical_radius
+    perimeter = math.pi * (3 * (a + b) - math.sqrt((3 * a + b) * (a + 3 * b)))
+    if perimeter < 1e-6: return 0.0
+    circularity = (4 * math.pi * area) / (perimeter * perimeter)
+    # Recorte a [0, 1] con comparaciones simples (sin llamadas a min/max)
+    return 0.0 if circularity < 0.0 else (1.0 if circularity > 1.0 else circularity)
+
+
+def _metrics_from_distances(d, has_iris: bool) -> Tuple[float, float, float]:
+    """Calcula (EAR, MAR, PUC) a partir de las distancias de los pares _PAIR_A/_PAIR_B."""
+    ear_left = (d[0] + d[1]) / (2.0 * d[2]) if d[2] > 1e-6 else 0.0
+    ear_right = (d[3] + d[4]) / (2.0 * d[5]) if d[5] > 1e-6 else 0.0
+    ear = (ear_left + ear_right) / 2.0
+    mar = d[6] / d[7] if d[7] > 1e-6 else 0.0
+
+    puc = 0.0
+    if has_iris:
+        puc_right = _circularity(d[8] / 2.0, d[9] / 2.0)
+        puc_left = _circularity(d[10] / 2.0, d[11] / 2.0)
+        puc = (puc_right + puc_left) / 2.0 if puc_right > 0 and puc_left > 0 else max(puc_right, puc_left)
+    return ear, mar, puc
+
+
+def _metrics_kernel(pts: np.ndarray, pair_a: np.ndarray, pair_b: np.ndarray, has_iris: bool) -> Tuple[float, float, float]:
+    """Versión escalar (para Numba) del cálculo de distancias + métricas."""
+    n_pairs = pair_a.shape[0] if has_iris else _NUM_PAIRS_NO_IRIS
+    d = np.empty(n_pairs)
+    for k in range(n_pairs):
+        dx = pts[pair_a[k], 0] - pts[pair_b[k], 0]
+        dy = pts[pair_a[k], 1] - pts[pair_b[k], 1]
+        d[k] = math.sqrt(dx * dx + dy * dy)
+    return _metrics_from_distances(d, has_iris)
+
+
+if NUMBA_AVAILABLE:
+    _circularity = njit(cache=True, fastmath=True)(_circularity)
+    _metrics_from_distances = njit(cache=True, fastmath=True)(_metrics_from_distances)
+    _metrics_kernel = njit(cache=True, fastmath=True)(_metrics_kernel)
+
 class PausaActivaHandler:
     """
     Gestiona el tiempo para las pausas activas, con lógica de pausa y reseteo
     basada en la presencia robusta del usuario (rostro O cuerpo).
     """
+    __slots__ = ('work_duration', 'reset_threshold', 'elapsed_work_time', 'is_paused',
+                 'pause_start_time', 'last_update_time', 'last_pausa_activa_time')
+
     def __init__(self, work_duration_secs: int = 3600, break_reset_threshold_secs: int = 180):
         """
         Args:
@@ -48,7 +127,7 @@ class PausaActivaHandler:
         self.elapsed_work_time: float = 0.0
         self.is_paused: bool = True
         self.pause_start_time: Optional[float] = None
-        self.last_update_time: float = time.time()
+        self.last_update_time: float = time.monotonic()
         self.last_pausa_activa_time: Optional[float] = None
         logger.info(f"PausaActivaHandler inicializado. Umbral de reseteo: {self.reset_threshold}s.")
 
@@ -57,13 +136,16 @@ class PausaActivaHandler:
         self.elapsed_work_time = 0.0
         self.is_paused = True
         self.pause_start_time = None
-        self.last_update_time = time.time()
-        self.last_pausa_activa_time = time.time()
+        self.last_update_time = time.monotonic()
+        self.last_pausa_activa_time = time.monotonic()
         logger.info("Manejador de Pausa Activa reseteado.")
 
-    def update(self, face_detected: bool, pose_detected: bool) -> Tuple[bool, Optional[int]]:
-        """Actualiza el estado del contador basado en la presencia del usuario."""
-        current_time = time.time()
+    def update(self, face_detected: bool, pose_detected: bool, now: Optional[float] = None) -> Tuple[bool, Optional[int]]:
+        """
+        Actualiza el estado del contador basado en la presencia del usuario.
+        'now' permite reutilizar la marca de tiempo ya tomada para el frame actual.
+        """
+        current_time = time.monotonic() if now is None else now
         delta_time = current_time - self.last_update_time
         self.last_update_time = current_time
         
@@ -100,11 +182,76 @@ class PausaActivaHandler:
         return should_alert, int(max(0, time_remaining))
 
 
+# Eventos detectados en un frame como bits de una máscara entera
+EVT_YAWN = 1 << 0
+EVT_DROWSY = 1 << 1
+EVT_DESPIERTA = 1 << 2
+EVT_NOD = 1 << 3
+EVT_RUB = 1 << 4
+EVT_DISTRACT = 1 << 5
+EVT_PAUSA = 1 << 6
+# Nombre de cada evento, en el orden de sus bits
+EVENT_NAMES = ("Bostezar", "Somnolencia", "Despierta", "Cabeceo", "Frotar Ojos", "Distraccion", "Pausa Activa")
+
+# Texto de alerta por prioridad: (bit, texto, es_alerta_máxima)
+_ALERT_TEXTS = (
+    (EVT_DESPIERTA, "¡DESPIERTA!", True),
+    (EVT_NOD, "NO TE DUERMAS", True),
+    (EVT_DROWSY, "SOMNOLENCIA DETECTADA", False),
+    (EVT_YAWN, "BOSTEZO DETECTADO", False),
+    (EVT_RUB, "DESCANSA LA VISTA", False),
+    (EVT_DISTRACT, "ATENCION AL FRENTE", False),
+    (EVT_PAUSA, "PAUSA ACTIVA RECOMENDADA", False),
+)
+
+
+def _event_names(mask: int) -> List[str]:
+    """Convierte una máscara de eventos en la lista de nombres correspondiente."""
+    return [name for i, name in enumerate(EVENT_NAMES) if mask & (1 << i)]
+
+
+class _S:
+    """Índices de los contadores de frames consecutivos en FatigueProcessor._counters."""
+    YAWN = 0
+    CLOSED = 1
+    STRETCH = 2
+    RUB = 3
+    DISTRACT = 4
+    NAMES = ('yawn_frames', 'closed_eyes_frames', 'stretching_frames', 'eye_rubbing_frames', 'distraction_frames')
+
+
+class _T:
+    """Índices de las marcas de tiempo de la última alerta en FatigueProcessor._last_times."""
+    YAWN = 0
+    STRETCH = 1
+    RUB = 2
+    DISTRACT = 3
+    DESPIERTA = 4
+    LSTM = 5
+    NAMES = ('last_yawn_time', 'last_stretching_time', 'last_eye_rub_time',
+             'last_distraction_alert_time', 'last_despierta_alert_time', 'last_lstm_alert_time')
+
+
 class FatigueProcessor:
     """
     Encapsula toda la lógica para la detección de fatiga, distracción y otros
     comportamientos. Es el cerebro del monitoreo de comportamiento.
     """
+    # Reutilización de métricas entre frames casi idénticos
+    METRICS_CACHE_MAX_DELTA_PX = 1.5
+    METRICS_CACHE_MAX_FRAMES = 5
+
+    # Atributos fijos: acceso por slot en lugar de por __dict__ en el bucle por frame
+    __slots__ = (
+        'config', 'nod_detector', 'lstm_classifier', 'pausa_handler', 'calibration_data',
+        '_counters', '_last_times',
+        '_face_pts_buf', '_last_face_pts', '_metrics_cache', '_metrics_cache_age',
+        '_lm_cache_src', '_lm_cache_shape', '_lm_cache',
+        '_yawn_frames_thresh', '_eyes_closed_max_frames', '_eyes_closed_drowsy_frames',
+        '_eye_rubbing_frames_thresh', '_distraction_frames_thresh',
+        '_yawn_mar_thresh', '_ear_drowsy_thresh',
+    )
+
     def __init__(self, config: Dict):
         self.config = config
         self.nod_detector = NodDetector(config.get('nod_detector_config', {}))
@@ -115,7 +262,9 @@ class FatigueProcessor:
             model_path = config.get('lstm_model_path', 'models/D.pth')
             if os.path.exists(model_path):
                 try:
-                    self.lstm_classifier = LSTMClassifier(model_path)
+                    self.lstm_classifier = LSTMClassifier(
+                        model_path, precision=config.get('lstm_precision', 'fp32')
+                    )
                     logger.info(f"Clasificador LSTM cargado desde {model_path}")
                 except Exception as e:
                     logger.error(f"Error al cargar el clasificador LSTM: {e}")
@@ -130,68 +279,120 @@ class FatigueProcessor:
         )
         
         self.calibration_data: Optional[Dict] = None
-        self.state: Dict[str, Any] = {}
+        self._resolve_thresholds()
+        # Estado por frame como arrays indexados por _S/_T (listas de Python: el acceso
+        # escalar es más rápido que en un ndarray y que en un diccionario)
+        self._counters: List[int] = [0] * len(_S.NAMES)
+        self._last_times: List[float] = [-math.inf] * len(_T.NAMES)
         self.reset_state()
 
+        # Buffer reutilizado para los puntos reunidos con _FACE_IDX en cada frame.
+        # Por esto una instancia de FatigueProcessor no debe usarse desde varios hilos a la vez.
+        self._face_pts_buf = np.empty((len(_FACE_IDX), 2), dtype=np.float64)
+        self._last_face_pts = np.empty_like(self._face_pts_buf)
+        # Última conversión de landmarks a píxeles: (objeto de origen, forma del frame, array)
+        self._lm_cache_src: Any = None
+        self._lm_cache_shape: Optional[Tuple[int, int]] = None
+        self._lm_cache: Optional[np.ndarray] = None
+
+        if NUMBA_AVAILABLE:
+            # Compilar (o cargar de la caché) el kernel ahora y no en el primer frame
+            _metrics_kernel(self._face_pts_buf, _PAIR_A, _PAIR_B, True)
+
+    def _resolve_thresholds(self):
+        """
+        Resuelve una sola vez los umbrales de configuración (y los que dependen de la
+        calibración) a atributos numéricos, para no repetir las búsquedas en cada frame.
+        Debe llamarse de nuevo si cambian la configuración o la calibración.
+        """
+        thresholds = self.config.get('fatigue_detection_thresholds', {})
+        self._yawn_frames_thresh = thresholds.get('YAWN_FRAMES_THRESHOLD', 8)
+        self._eyes_closed_max_frames = thresholds.get('MAX_ALERT_EYES_CLOSED_FRAMES', 60)
+        self._eyes_closed_drowsy_frames = thresholds.get('DROWSINESS_EYES_CLOSED_FRAMES', 20)
+        self._eye_rubbing_frames_thresh = thresholds.get('EYE_RUBBING_FRAMES', 15)
+        self._distraction_frames_thresh = thresholds.get('DISTRACTION_FRAMES_THRESHOLD', 30)
+
+        cal_data = self.calibration_data
+        if cal_data:
+            self._yawn_mar_thresh = cal_data['cal_mar_mean'] * thresholds.get('YAWN_MAR_FACTOR', 1.8)
+            self._ear_drowsy_thresh = cal_data['cal_ear_mean'] * thresholds.get('DROWSINESS_EAR_FACTOR', 0.75)
+        else:
+            self._yawn_mar_thresh = self._ear_drowsy_thresh = None
+
     def set_calibration(self, calibration_data: Dict):
         """Establece los datos de calibración para la sesión de inferencia."""
         self.calibration_data = calibration_data
+        self._resolve_thresholds()
         logger.info(f"FatigueProcessor calibrado con datos: {calibration_data}")
         self.reset_state()
 
     def reset_state(self):
         """Reinicia el estado interno para una nueva sesión de monitoreo."""
-        self.state = {
-            'yawn_frames': 0, 'closed_eyes_frames': 0, 'stretching_frames': 0,
-            'eye_rubbing_frames': 0, 'distraction_frames': 0,
-            'last_yawn_time': 0, 'last_stretching_time': 0, 'last_eye_rub_time': 0,
-            'last_distraction_alert_time': 0, 'last_despierta_alert_time': 0,
-        }
+        self._counters[:] = [0] * len(_S.NAMES)
+        # -inf: sin alerta previa (el reloj monótono puede estar cerca de 0 tras el arranque)
+        self._last_times[:] = [-math.inf] * len(_T.NAMES)
         self.nod_detector.reset()
         self.pausa_handler.reset()
+        # Caché de métricas: (n_puntos, (ear, mar, puc)) del último cálculo completo
+        self._metrics_cache: Optional[Tuple[int, Tuple[float, float, float]]] = None
+        self._metrics_cache_age = 0
         logger.info("Estado de FatigueProcessor reseteado.")
 
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        """Vista de solo lectura del estado con las claves del diccionario original."""
+        return {**dict(zip(_S.NAMES, self._counters)), **dict(zip(_T.NAMES, self._last_times))}
+
     def _calculate_facial_metrics(self, face_landmarks: Any, frame_shape: Tuple[int, int], calibration_data: Optional[Dict] = None) -> Dict:
         """Calcula todas las métricas faciales (EAR, MAR, PUC, MOE) a partir de los landmarks."""
-        h, w = frame_shape
-        lm_np = np.array([(lm.x * w, lm.y * h) for lm in face_landmarks.landmark])
-        
-        def _distance(p1, p2): return np.linalg.norm(p1 - p2)
-        
-        def _eye_aspect_ratio(eye_points):
-            A = _distance(eye_points[1], eye_points[5])
-            B = _distance(eye_points[2], eye_points[4])
-            C = _distance(eye_points[0], eye_points[3])
-            return (A + B) / (2.0 * C) if C > 1e-6 else 0.0
-
-        left_eye_pts = lm_np[[362, 385, 387, 263, 373, 380]]
-        right_eye_pts = lm_np[[33, 160, 158, 133, 153, 144]]
-        ear = (_eye_aspect_ratio(left_eye_pts) + _eye_aspect_ratio(right_eye_pts)) / 2.0
+        # Si se vuelve a pasar el mismo objeto de landmarks (mismo frame) se reutiliza su
+        # conversión. Se guarda la referencia al objeto, no su id(), para que no pueda
+        # reciclarse para otro objeto mientras está en la caché.
+        if face_landmarks is self._lm_cache_src and frame_shape == self._lm_cache_shape:
+            lm_np = self._lm_cache
+        else:
+            h, w = frame_shape
+            # Coordenadas (x, y) de todos los landmarks en un solo paso y escaladas a píxeles
+            # con una única operación vectorizada. Se mantiene float64 para que las métricas
+            # sigan siendo floats de Python compatibles (sqlite3, json).
+            landmarks = face_landmarks.landmark
+            lm_np = np.fromiter(
+                (c for lm in landmarks for c in (lm.x, lm.y)), dtype=np.float64, count=2 * len(landmarks)
+            ).reshape(-1, 2)
+            lm_np *= (w, h)
+            lm_np.flags.writeable = False  # Compartido entre llamadas: solo lectura
+            self._lm_cache_src, self._lm_cache_shape, self._lm_cache = face_landmarks, frame_shape, lm_np
         
-        mouth_pts = lm_np[[61, 291, 0, 17]]
-        mar = _distance(mouth_pts[0], mouth_pts[1]) / _distance(mouth_pts[2], mouth_pts[3])
-
-        def _calculate_circularity(iris_landmarks_np):
-            horizontal_radius = _distance(iris_landmarks_np[2], iris_landmarks_np[4]) / 2.0
-            vertical_radius = _distance(iris_landmarks_np[1], iris_landmarks_np[3]) / 2.0
-            if horizontal_radius < 1e-6 or vertical_radius < 1e-6: return 0.0
-            area = math.pi * horizontal_radius * vertical_radius
-            a, b = horizontal_radius, vertical_radius
-            perimeter = math.pi * (3 * (a + b) - math.sqrt((3 * a + b) * (a + 3 * b)))
-            if perimeter < 1e-6: return 0.0
-            circularity = (4 * math.pi * area) / (perimeter ** 2)
-            return np.clip(circularity, 0.0, 1.0)
-
-        puc = 0.0
-        try:
-            right_iris_pts = lm_np[[473, 474, 475, 476, 477]]
-            left_iris_pts = lm_np[[468, 469, 470, 471, 472]]
-            puc_right = _calculate_circularity(right_iris_pts)
-            puc_left = _calculate_circularity(left_iris_pts)
-            puc = (puc_right + puc_left) / 2.0 if puc_right > 0 and puc_left > 0 else max(puc_right, puc_left)
-        except IndexError:
+        has_iris = lm_np.shape[0] >= _NUM_LANDMARKS_WITH_IRIS
+        n_points = len(_FACE_IDX) if has_iris else _NUM_POINTS_NO_IRIS
+        pts = self._face_pts_buf[:n_points]
+        np.take(lm_np, _FACE_IDX[:n_points], axis=0, out=pts)
+
+        # Si ninguno de los puntos de los que dependen las métricas se ha movido más de
+        # METRICS_CACHE_MAX_DELTA_PX desde el último cálculo, se reutilizan EAR/MAR/PUC
+        # (forzando un recálculo cada METRICS_CACHE_MAX_FRAMES frames).
+        last = self._metrics_cache
+        if (last is not None and last[0] == n_points and self._metrics_cache_age < self.METRICS_CACHE_MAX_FRAMES
+                and np.abs(pts - self._last_face_pts[:n_points]).max() < self.METRICS_CACHE_MAX_DELTA_PX):
+            ear, mar, puc = last[1]
+            self._metrics_cache_age += 1
+        else:
+            if NUMBA_AVAILABLE:
+                ear, mar, puc = _metrics_kernel(pts, _PAIR_A, _PAIR_B, has_iris)
+            else:
+                # Para una docena de pares math.dist sobre floats de Python es más
+                # rápido que el despacho de np.linalg.norm
+                n_pairs = len(_PAIRS) if has_iris else _NUM_PAIRS_NO_IRIS
+                p = pts.tolist()
+                d = [math.dist(p[a], p[b]) for a, b in _PAIRS[:n_pairs]]
+                ear, mar, puc = _metrics_from_distances(d, has_iris)
+            self._last_face_pts[:n_points] = pts
+            self._metrics_cache = (n_points, (ear, mar, puc))
+            self._metrics_cache_age = 0
+
+        if not has_iris:
             logger.warning("Landmarks de iris no disponibles para cálculo de PUC.")
-            puc = 0.0
             
         moe = 0.0
         if calibration_data and 'cal_ear_mean' in calibration_data and 'cal_mar_mean' in calibration_data:
@@ -213,30 +414,32 @@ class FatigueProcessor:
 
     def process_frame_for_inference(self, frame: np.ndarray, face_results: Any, hand_results: Any, pose_results: Any) -> Tuple[List[str], Dict]:
         """Método principal. Procesa un frame para detectar eventos de fatiga."""
-        detected_events = []
+        events_mask = 0
         overlay_data = {'metrics': {}, 'alert_text': None, 'is_max_alert': False, 'pausa_text': None}
+        # Un único instante de referencia para todo el frame. Reloj monótono: los intervalos
+        # no se ven afectados por ajustes del reloj del sistema (NTP, cambios de hora).
+        current_time = time.monotonic()
         frame_h, frame_w, _ = frame.shape
         
         face_detected = bool(face_results and face_results.multi_face_landmarks)
         pose_detected = bool(pose_results and pose_results.pose_landmarks)
 
-        alert_pausa, time_remaining = self.pausa_handler.update(face_detected, pose_detected)
-        if alert_pausa: detected_events.append("Pausa Activa")
+        alert_pausa, time_remaining = self.pausa_handler.update(face_detected, pose_detected, current_time)
+        if alert_pausa: events_mask |= EVT_PAUSA
         if time_remaining is not None:
             mins, secs = divmod(time_remaining, 60)
             overlay_data['pausa_text'] = f"Pausa en: {mins:02d}:{secs:02d}"
 
         if not face_detected:
-            self.state['distraction_frames'] += 1
-            threshold = self.config.get('fatigue_detection_thresholds', {}).get('DISTRACTION_FRAMES_THRESHOLD', 30)
-            if self.state['distraction_frames'] > threshold:
-                if time.time() - self.state['last_distraction_alert_time'] > 5:
-                    detected_events.append("Distraccion")
-                    self.state['last_distraction_alert_time'] = time.time()
+            self._counters[_S.DISTRACT] += 1
+            if self._counters[_S.DISTRACT] > self._distraction_frames_thresh:
+                if current_time - self._last_times[_T.DISTRACT] > 5:
+                    events_mask |= EVT_DISTRACT
+                    self._last_times[_T.DISTRACT] = current_time
             overlay_data['alert_text'] = "ROSTRO NO DETECTADO"
-            return list(set(detected_events)), overlay_data
+            return _event_names(events_mask), overlay_data
         
-        self.state['distraction_frames'] = 0
+        self._counters[_S.DISTRACT] = 0
         face_landmarks_obj = face_results.multi_face_landmarks[0]
         
         metrics = self._calculate_facial_metrics(face_landmarks_obj, (frame_h, frame_w), self.calibration_data)
@@ -252,9 +455,9 @@ class FatigueProcessor:
             )
             if lstm_prediction is not None:
                 overlay_data['lstm_prediction'] = lstm_prediction
-                if lstm_prediction == 1 and current_time - self.state.get('last_lstm_alert_time', 0) > 30:
-                    detected_events.append("Somnolencia")
-                    self.state['last_lstm_alert_time'] = current_time
+                if lstm_prediction == 1 and current_time - self._last_times[_T.LSTM] > 30:
+                    events_mask |= EVT_DROWSY
+                    self._last_times[_T.LSTM] = current_time
                     logger.info("Detección de somnolencia por LSTM")
         
         if self.calibration_data is None:
@@ -263,58 +466,42 @@ class FatigueProcessor:
         angle_x, angle_y = calculate_head_angle(face_landmarks_obj)
         overlay_data['angles'] = {'x': angle_x or 0.0, 'y': angle_y or 0.0}
 
-        thresholds = self.config.get('fatigue_detection_thresholds', {})
-        cal_data = self.calibration_data
-        current_time = time.time()
-
-        if metrics['mar'] > cal_data['cal_mar_mean'] * thresholds.get('YAWN_MAR_FACTOR', 1.8):
-            self.state['yawn_frames'] += 1
-            if self.state['yawn_frames'] > thresholds.get('YAWN_FRAMES_THRESHOLD', 8):
-                if current_time - self.state['last_yawn_time'] > 10:
-                    detected_events.append("Bostezar")
-                    self.state['last_yawn_time'] = current_time
-                    self.state['yawn_frames'] = 0
-        else:
-            self.state['yawn_frames'] = 0
-            
-        ear_threshold = cal_data['cal_ear_mean'] * thresholds.get('DROWSINESS_EAR_FACTOR', 0.75)
-        if metrics['ear'] < ear_threshold:
-            self.state['closed_eyes_frames'] += 1
-            if self.state['closed_eyes_frames'] > thresholds.get('MAX_ALERT_EYES_CLOSED_FRAMES', 60):
-                if current_time - self.state['last_despierta_alert_time'] > 5:
-                    detected_events.append("Despierta")
-                    self.state['last_despierta_alert_time'] = current_time
-            elif self.state['closed_eyes_frames'] > thresholds.get('DROWSINESS_EYES_CLOSED_FRAMES', 20):
-                detected_events.append("Somnolencia")
-        else:
-            self.state['closed_eyes_frames'] = 0
+        # Cada contador de frames consecutivos avanza si hubo actividad en este frame y
+        # vuelve a 0 si no: (n + 1) * activo, sin ramas de reseteo por separado
+        counters = self._counters
+        yawn_active = metrics['mar'] > self._yawn_mar_thresh
+        eyes_closed = metrics['ear'] < self._ear_drowsy_thresh
+        rubbing = detect_eye_rubbing(metrics.get('landmarks_np'), hand_results, self.config) > 0
+        counters[_S.YAWN] = (counters[_S.YAWN] + 1) * yawn_active
+        counters[_S.CLOSED] = (counters[_S.CLOSED] + 1) * eyes_closed
+        counters[_S.RUB] = (counters[_S.RUB] + 1) * rubbing
+
+        if counters[_S.YAWN] > self._yawn_frames_thresh:
+            if current_time - self._last_times[_T.YAWN] > 10:
+                events_mask |= EVT_YAWN
+                self._last_times[_T.YAWN] = current_time
+                counters[_S.YAWN] = 0
+
+        if counters[_S.CLOSED] > self._eyes_closed_max_frames:
+            if current_time - self._last_times[_T.DESPIERTA] > 5:
+                events_mask |= EVT_DESPIERTA
+                self._last_times[_T.DESPIERTA] = current_time
+        elif counters[_S.CLOSED] > self._eyes_closed_drowsy_frames:
+            events_mask |= EVT_DROWSY
 
         is_nodding, _ = self.nod_detector.update(angle_y or 0.0)
         if is_nodding:
-            detected_events.append("Cabeceo")
-            
-        rub_type = detect_eye_rubbing(metrics.get('landmarks_np'), hand_results, self.config)
-        if rub_type > 0:
-            self.state['eye_rubbing_frames'] += 1
-            if self.state['eye_rubbing_frames'] > thresholds.get('EYE_RUBBING_FRAMES', 15):
-                if current_time - self.state['last_eye_rub_time'] > 10:
-                    detected_events.append("Frotar Ojos")
-                    self.state['last_eye_rub_time'] = current_time
-        else:
-            self.state['eye_rubbing_frames'] = 0
-
-        if "Despierta" in detected_events or "Cabeceo" in detected_events:
-            overlay_data['alert_text'] = "¡DESPIERTA!" if "Despierta" in detected_events else "NO TE DUERMAS"
-            overlay_data['is_max_alert'] = True
-        elif "Somnolencia" in detected_events:
-            overlay_data['alert_text'] = "SOMNOLENCIA DETECTADA"
-        elif "Bostezar" in detected_events:
-            overlay_data['alert_text'] = "BOSTEZO DETECTADO"
-        elif "Frotar Ojos" in detected_events:
-            overlay_data['alert_text'] = "DESCANSA LA VISTA"
-        elif "Distraccion" in detected_events:
-            overlay_data['alert_text'] = "ATENCION AL FRENTE"
-        elif "Pausa Activa" in detected_events:
-            overlay_data['alert_text'] = "PAUSA ACTIVA RECOMENDADA"
+            events_mask |= EVT_NOD
+
+        if counters[_S.RUB] > self._eye_rubbing_frames_thresh:
+            if current_time - self._last_times[_T.RUB] > 10:
+                events_mask |= EVT_RUB
+                self._last_times[_T.RUB] = current_time
+
+        for bit, text, is_max in _ALERT_TEXTS:
+            if events_mask & bit:
+                overlay_data['alert_text'] = text
+                overlay_data['is_max_alert'] = is_max
+                break
             
-        return list(set(detected_events)), overlay_data
\ No newline at end of file
+        return _event_names(events_mask), overlay_data
\ No newline at end of file
@@ -4,17 +4,20 @@ import sys
 import os
 import cv2
 import numpy as np
+import math
 import time
 import copy
-import pandas as pd
+import queue
+import threading
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QFrame, QGroupBox, QTreeWidget, QTreeWidgetItem, 
                              QHeaderView, QListWidget, QListWidgetItem, QTextEdit, QComboBox, 
-                             QSlider, QMessageBox, QTabWidget, QDateEdit, QTableWidget, QTableWidgetItem,
-                             QInputDialog, QLineEdit, QSizePolicy, QFormLayout, QMenu)
-from PyQt5.QtCore import Qt, QTimer, QSize, QDate, pyqtSignal, QPoint, QObject, QThread
+                             QSlider, QMessageBox, QTabWidget, QDateEdit, QTableView, QAbstractItemView,
+                             QInputDialog, QLineEdit, QSizePolicy, QFormLayout, QMenu, QStyle)
+from PyQt5.QtCore import (Qt, QTimer, QSize, QDate, pyqtSignal, pyqtSlot, QPoint, QObject, QThread, QRunnable, QThreadPool,
+                          QAbstractTableModel, QModelIndex)
 from PyQt5.QtGui import QImage, QPixmap, QFont, QIcon
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 
@@ -25,12 +28,10 @@ from database_manager import DatabaseManager
 from camera_thread import CameraThread
 from face_processor import FaceProcessor
 from pose_estimator import PoseEstimator
-from fatigue_processor import FatigueProcessor
+from fatigue_processor import FatigueProcessor, EVENT_NAMES as FATIGUE_EVENT_NAMES
 from settings_dialog import SettingsDialog
-from analytics_processor import AnalyticsProcessor
 import roi_autoexp
 import notificaciones
-import mediapipe as mp  # Importación directa de mediapipe
 
 try:
     from mpu_thread import MPUThread
@@ -38,10 +39,33 @@ except ImportError:
     MPUThread = None
     logger.warning("No se pudo importar MPUThread. El modo reposo por hardware no estará disponible.")
 
+# Frames con rostro que se recogen en la calibración en tiempo real (aprox. 5 s a ~20 fps)
+# y métricas de cada uno, en el orden de las columnas del buffer de calibración
+CALIBRATION_FRAMES = 100
+CALIBRATION_METRICS = ('ear', 'mar', 'puc', 'moe')
+
+# Eventos que se cuentan en la sesión (los que emite FatigueProcessor y los configurables)
+# y su posición en el contador de MainWindow.fatigue_event_counts
+EVENT_NAMES = tuple(dict.fromkeys((*FATIGUE_EVENT_NAMES, *ConfigManager.get_default_config_view()['event_toggles'])))
+EVENT_CODE = {name: code for code, name in enumerate(EVENT_NAMES)}
+
+# Qt >= 5.14 admite píxeles en orden BGR: los frames de OpenCV se muestran sin convertirlos a RGB
+QIMAGE_FORMAT_BGR888 = getattr(QImage, 'Format_BGR888', None)
+
 # --- Hilo para Tareas Pesadas en Segundo Plano ---
 class AnalyticsWorker(QObject):
+    """
+    Genera el reporte de analíticas en tres etapas encadenadas por colas acotadas:
+    un hilo lector trae los eventos de la BD por bloques, un hilo de cálculo los va
+    procesando (AnalyticsAccumulator) y este worker emite el progreso y el resultado.
+    Así la lectura de la BD se solapa con el procesamiento con pandas.
+    """
     finished = pyqtSignal(object)
     error = pyqtSignal(Exception)
+    progress = pyqtSignal(int)  # Eventos procesados hasta el momento
+
+    CHUNK_SIZE = 5000
+    QUEUE_SIZE = 2
 
     def __init__(self, db_manager, user_id, start_date, end_date):
         super().__init__()
@@ -50,18 +74,198 @@ class AnalyticsWorker(QObject):
         self.start_date = start_date
         self.end_date = end_date
 
+    def _read_stage(self, chunks_q: queue.Queue):
+        """Etapa 1: lee los eventos por bloques. Termina con None (o con la excepción)."""
+        try:
+            for chunk in self.db_manager.get_behavioral_events_iter(
+                    self.user_id, self.start_date, self.end_date, chunk_size=self.CHUNK_SIZE):
+                chunks_q.put(chunk)
+        except Exception as e:
+            chunks_q.put(e)
+        finally:
+            chunks_q.put(None)
+
+    def _compute_stage(self, chunks_q: queue.Queue, results_q: queue.Queue):
+        """Etapa 2: procesa cada bloque según llega y publica el progreso y el resultado final."""
+        # Importación diferida: analytics_processor arrastra pandas, que solo hace falta al generar un reporte
+        from analytics_processor import AnalyticsAccumulator
+        accumulator = AnalyticsAccumulator()
+        events_data = []
+        try:
+            while (chunk := chunks_q.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                accumulator.add(chunk)
+                events_data.extend(chunk)
+                results_q.put(accumulator.total_events)
+            results_q.put({'kpis': accumulator.to_processor().kpis, 'events_data': events_data})
+        except Exception as e:
+            results_q.put(e)
+            while chunks_q.get() is not None:  # Vaciar para que el lector no quede bloqueado
+                pass
+        finally:
+            results_q.put(None)
+
     def run(self):
         try:
             logger.info(f"Worker de analíticas iniciado para usuario ID: {self.user_id}...")
-            events_data = self.db_manager.get_behavioral_events(self.user_id, self.start_date, self.end_date)
-            processor = AnalyticsProcessor(events_data)
-            kpis = processor.calculate_kpis()
-            result = {'kpis': kpis, 'events_data': events_data}
+            chunks_q = queue.Queue(maxsize=self.QUEUE_SIZE)
+            results_q = queue.Queue(maxsize=self.QUEUE_SIZE)
+            stages = [
+                threading.Thread(target=self._read_stage, args=(chunks_q,), name="analytics-read", daemon=True),
+                threading.Thread(target=self._compute_stage, args=(chunks_q, results_q), name="analytics-compute", daemon=True),
+            ]
+            for stage in stages:
+                stage.start()
+
+            # Etapa 3: emitir progreso y resultado desde el hilo del worker
+            result = None
+            while (item := results_q.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                if isinstance(item, int):
+                    self.progress.emit(item)
+                else:
+                    result = item
+            for stage in stages:
+                stage.join()
             self.finished.emit(result)
         except Exception as e:
             logger.error(f"Error en el worker de analíticas: {e}", exc_info=True)
             self.error.emit(e)
 
+# --- Hilo de Inferencia ---
+class InferenceWorker(QObject):
+    """
+    Ejecuta la inferencia de MediaPipe (FaceProcessor.process_all) en un QThread propio
+    (moveToThread), de modo que el hilo de la GUI solo ejecuta la máquina de estados y el
+    dibujado. Igual que CameraWorker, guarda solo el frame más reciente: si la inferencia
+    va más lenta que la cámara, los frames intermedios se descartan en lugar de encolarse.
+    """
+    # (frame_bgr, face_results, hand_results, pose_results)
+    results_ready = pyqtSignal(object, object, object, object)
+    # Aviso interno de frame pendiente; se entrega en cola en el hilo del trabajador
+    _frame_pending = pyqtSignal()
+
+    def __init__(self, face_processor: FaceProcessor):
+        super().__init__()
+        self.face_processor = face_processor
+        self._pending_frame: Optional[np.ndarray] = None
+        self._pending_lock = threading.Lock()
+        self.frames_dropped = 0  # Frames sustituidos antes de llegar a la inferencia (diagnóstico)
+        self._frame_pending.connect(self._process_pending)
+
+    def submit(self, frame_bgr: np.ndarray):
+        """Deja el frame para inferencia, sustituyendo al anterior si aún no se ha procesado."""
+        with self._pending_lock:
+            notify = self._pending_frame is None
+            if not notify:
+                self.frames_dropped += 1
+            self._pending_frame = frame_bgr
+        if notify:
+            self._frame_pending.emit()
+
+    @pyqtSlot()
+    def _process_pending(self):
+        with self._pending_lock:
+            frame_bgr, self._pending_frame = self._pending_frame, None
+        if frame_bgr is None:
+            return
+        try:
+            face_results, hand_results, pose_results = self.face_processor.process_all(frame_bgr)
+        except Exception as e:
+            logger.error(f"Error en la inferencia de MediaPipe: {e}", exc_info=True)
+            return
+        self.results_ready.emit(frame_bgr, face_results, hand_results, pose_results)
+
+# --- Modelo de la Tabla de Eventos del Reporte ---
+class EventsModel(QAbstractTableModel):
+    """
+    Modelo de solo lectura sobre la lista de eventos del reporte. La vista solo pide
+    (con data()) las celdas visibles, así que mostrar decenas de miles de eventos no
+    crea un objeto por celda como QTableWidget.
+    """
+    HEADERS = ("Fecha y Hora", "Usuario", "Tipo de Evento", "Detalles")
+
+    def __init__(self, events_data: Optional[List[Dict[str, Any]]] = None, parent=None):
+        super().__init__(parent)
+        self._rows = events_data or []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        event = self._rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return event.get('fecha_hora') or ''
+        if column == 1:
+            return event.get('codigo_usuario') or 'N/A'
+        if column == 2:
+            return event.get('tipo_evento') or ''
+        duration = event.get('duracion_seg')
+        return str(duration) if duration else ''
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+# --- Miniaturas de la Lista de Usuarios ---
+THUMB_SIZE = 64
+
+class _ThumbSignals(QObject):
+    # (user_id, ruta, mtime, imagen escalada; QImage nula si no se pudo leer)
+    done = pyqtSignal(int, str, float, QImage)
+
+def _decode_thumb(image_path: str) -> QImage:
+    """
+    Decodifica una foto y la reduce para que quepa en THUMB_SIZE x THUMB_SIZE manteniendo
+    la proporción. INTER_AREA (vectorizado en OpenCV) es más rápido que el escalado suave
+    de Qt y da mejor resultado en reducciones grandes. Devuelve un QImage nulo si falla.
+    """
+    # imdecode sobre los bytes del fichero admite rutas no ASCII, a diferencia de imread en Windows
+    try:
+        data = np.fromfile(image_path, dtype=np.uint8)
+    except OSError:
+        return QImage()
+    bgr = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if bgr is None:
+        return QImage()
+    h, w = bgr.shape[:2]
+    scale = THUMB_SIZE / max(h, w)
+    if scale < 1.0:
+        bgr = cv2.resize(bgr, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    h, w = bgr.shape[:2]
+    if QIMAGE_FORMAT_BGR888 is not None:
+        pixels, image_format = np.ascontiguousarray(bgr), QIMAGE_FORMAT_BGR888
+    else:
+        pixels, image_format = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), QImage.Format_RGB888
+    # copy(): el QImage no debe apuntar a memoria de un array que se va a liberar
+    return QImage(pixels.data, w, h, pixels.strides[0], image_format).copy()
+
+class ThumbTask(QRunnable):
+    """
+    Decodifica y escala la foto de un usuario fuera del hilo de la GUI. Trabaja con
+    QImage (QPixmap solo puede usarse en el hilo principal) y devuelve el resultado
+    por una señal, que Qt entrega en cola al hilo de la GUI.
+    """
+    def __init__(self, user_id: int, image_path: str, mtime: float, signals: _ThumbSignals):
+        super().__init__()
+        self.user_id = user_id
+        self.image_path = image_path
+        self.mtime = mtime
+        self.signals = signals
+
+    def run(self):
+        image = _decode_thumb(self.image_path)
+        self.signals.done.emit(self.user_id, self.image_path, self.mtime, image)
+
 # --- Clase Personalizada para la Lista de Usuarios ---
 class UserImageLabel(QLabel):
     deleteUser = pyqtSignal(int)
@@ -74,15 +278,16 @@ class UserImageLabel(QLabel):
         self.image_path = image_path
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
+        # El menú contextual se construye una vez y se reutiliza en cada clic derecho
+        self._menu = QMenu(self)
+        self._view_action = self._menu.addAction("Ver Detalles")
+        self._delete_action = self._menu.addAction("Eliminar Usuario")
 
     def show_context_menu(self, position: QPoint):
-        context_menu = QMenu(self)
-        view_action = context_menu.addAction("Ver Detalles")
-        delete_action = context_menu.addAction("Eliminar Usuario")
-        action = context_menu.exec_(self.mapToGlobal(position))
-        if action == view_action:
+        action = self._menu.exec_(self.mapToGlobal(position))
+        if action == self._view_action:
             self.viewUserDetails.emit(self.user_id)
-        elif action == delete_action:
+        elif action == self._delete_action:
             self.deleteUser.emit(self.user_id)
 
 # --- Clase Principal de la GUI ---
@@ -100,7 +305,8 @@ class MainWindow(QMainWindow):
         self.camera_status = QLabel("Estado: Inicializando...")
         self.status_label = QLabel("Iniciando...")
         
-        self.config = ConfigManager.load_full_config()
+        self.config = ConfigManager.get().data
+        self._configure_opencv_threads()
         self.db_manager = DatabaseManager()
         self.face_processor = FaceProcessor(self.config)
         self.fatigue_processor = FatigueProcessor(self.config)
@@ -111,19 +317,32 @@ class MainWindow(QMainWindow):
 
         self.camera_thread: Optional[CameraThread] = None
         self.mpu_thread: Optional[MPUThread] = None
+
+        # Inferencia de MediaPipe en su propio hilo; los resultados vuelven en cola a la GUI
+        self._inference_thread = QThread(self)
+        self._inference_worker = InferenceWorker(self.face_processor)
+        self._inference_worker.moveToThread(self._inference_thread)
+        self._inference_worker.results_ready.connect(self._on_inference_results)
+        self._inference_thread.start()
+        # Embeddings conocidos cargados de la BD para identificar: (modelo, lista). Se reutiliza la
+        # misma lista mientras no cambien, así FaceProcessor conserva su matriz (N, D) ya apilada.
+        # Se invalida (None) al añadir embeddings o cambiar la configuración.
+        self._known_embeddings: Optional[Tuple[str, List[Dict]]] = None
+        # Hilo único para guardar fotos y embeddings de enriquecimiento fuera del bucle de frames
+        self._profile_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
         self.analytics_worker_thread: Optional[QThread] = None
         
         # Variables para el manejo de cámaras
         self.capturing = False
         max_idx_to_check = self.config['camera_settings'].get('MAX_CAMERA_INDEX_TO_CHECK', 4)
-        self.available_cameras = self._detect_available_cameras(max_idx_to_check)
+        self.available_cameras = self._detect_cameras_at_startup(max_idx_to_check)
         
         # Obtener el índice de la cámara actual del config, o la primera disponible
         self.camera_index = self.config['camera_settings'].get('camera_index', 0)
         if self.available_cameras and self.camera_index not in self.available_cameras:
             self.camera_index = self.available_cameras[0]
-            self.config['camera_settings']['camera_index'] = self.camera_index
-            ConfigManager.save_full_config(self.config)
+            # Se guarda en memoria; se escribe a disco con el siguiente flush() (como tarde al cerrar)
+            ConfigManager.get().set('camera_settings.camera_index', self.camera_index)
         
         # Si no hay cámaras, establecer el índice a -1
         if not self.available_cameras:
@@ -133,12 +352,33 @@ class MainWindow(QMainWindow):
         self.current_user_id: Optional[int] = None
         self.current_user_code: str = "N/A"
         self.current_frame_array: Optional[np.ndarray] = None
+        # Buffer RGB persistente para mostrar el video y QImage que lo envuelve sin copiar;
+        # se recrean solo si cambia la resolución del frame
+        self._display_buf: Optional[np.ndarray] = None
+        self._display_qimage: Optional[QImage] = None
         self.last_monitoring_data: Dict = {}
         self.video_is_visible = True
         self.photos_are_visible = not self.config.get('privacy_settings', {}).get('privacy_mode_default', True)
-        self.fatigue_event_counts = defaultdict(int)
+        # Miniaturas ya decodificadas: user_id -> (ruta, mtime, QPixmap); se invalidan si cambia la foto
+        self._thumb_cache: Dict[int, Tuple[str, float, QPixmap]] = {}
+        self._thumb_labels: Dict[int, UserImageLabel] = {}  # Etiquetas de la lista actual por usuario
+        # Filas de la lista de usuarios reutilizadas entre recargas: user_id -> (ítem, miniatura, texto)
+        self._user_widgets: Dict[int, Tuple[QListWidgetItem, UserImageLabel, QLabel]] = {}
+        # Ícono genérico para usuarios sin foto (o mientras se decodifica la miniatura)
+        self._user_placeholder_pixmap = self.style().standardIcon(QStyle.SP_DirHomeIcon).pixmap(QSize(THUMB_SIZE, THUMB_SIZE))
+        self._thumb_signals = _ThumbSignals()
+        self._thumb_signals.done.connect(self._on_thumb_ready)
+        self.fatigue_event_counts = [0] * len(EVENT_NAMES)  # Indexado por EVENT_CODE
+        self._event_items: Dict[str, QTreeWidgetItem] = {}  # Ítem del árbol de eventos por nombre
+        # Textos pendientes de las etiquetas que cambian en cada frame; se aplican a 10 Hz
+        self._label_updates: Dict[QLabel, str] = {}
+        self._flush_timer = QTimer(self)
+        self._flush_timer.timeout.connect(self._flush_labels)
+        self._flush_timer.start(100)
         self.is_calibrating = False
-        self.calibration_frames_data = []
+        # Métricas de calibración en un buffer preasignado (una fila por frame) y filas llenas
+        self._calibration_buf = np.empty((CALIBRATION_FRAMES, len(CALIBRATION_METRICS)), dtype=np.float64)
+        self._calibration_count = 0
 
         self.state_timers = {
             'stable_face_counter': 0, 'face_lost_counter': 0,
@@ -180,21 +420,48 @@ class MainWindow(QMainWindow):
         right_panel = self._create_right_panel()
         main_layout.addWidget(left_panel); main_layout.addWidget(right_panel, 1)
 
+    def _configure_opencv_threads(self):
+        """
+        Limita el pool de hilos de OpenCV para que no compita con MediaPipe, el pool de Qt
+        y los hilos de captura. Por defecto usa la mitad de los núcleos lógicos (los físicos
+        con SMT); 'performance.opencv_threads' > 0 fija el número explícitamente.
+        """
+        requested = self.config.get('performance', {}).get('opencv_threads', 0)
+        threads = requested if requested > 0 else max(1, (os.cpu_count() or 2) // 2)
+        cv2.setNumThreads(threads)
+        simd = [name for name in ('AVX2', 'NEON')
+                if hasattr(cv2, f'CPU_{name}') and cv2.checkHardwareSupport(getattr(cv2, f'CPU_{name}'))]
+        logger.info(f"OpenCV: {threads} hilos, SIMD disponible: {', '.join(simd) or 'ninguno'}.")
+
+    @staticmethod
+    def _probe_camera(index: int) -> Optional[int]:
+        """Abre la cámara 'index', intenta leer un frame y la libera. Devuelve el índice si es funcional."""
+        cap = cv2.VideoCapture(index)
+        if cap is None or not cap.isOpened():
+            # Si cap no se abrió, no es necesario llamar a .release()
+            return None
+        try:
+            # Intenta leer un frame para confirmar que es funcional
+            ret, _ = cap.read()
+        finally:
+            cap.release()  # Liberar el recurso inmediatamente
+        if ret:
+            logger.info(f"Cámara funcional en índice {index}.")
+            return index
+        return None
+
     def _detect_available_cameras(self, max_idx_to_check: int) -> list[int]:
-        """Detecta los índices de las cámaras disponibles."""
-        available_indices = []
+        """
+        Detecta los índices de las cámaras disponibles. Los índices se prueban en paralelo
+        (OpenCV libera el GIL mientras el driver inicializa el dispositivo), así que el
+        tiempo total es el de la sonda más lenta y no la suma de todas.
+        """
         logger.info(f"Detectando cámaras hasta índice {max_idx_to_check}...")
         
-        for i in range(max_idx_to_check + 1):
-            cap = cv2.VideoCapture(i)
-            if cap is not None and cap.isOpened():
-                # Intenta leer un frame para confirmar que es funcional
-                ret, _ = cap.read()
-                if ret:
-                    logger.info(f"Cámara funcional en índice {i}.")
-                    available_indices.append(i)
-                cap.release()  # Liberar el recurso inmediatamente
-            # Si cap no se abrió, no es necesario llamar a .release()
+        indices = range(max_idx_to_check + 1)
+        with ThreadPoolExecutor(max_workers=len(indices), thread_name_prefix="camera-probe") as pool:
+            futures = [pool.submit(self._probe_camera, i) for i in indices]
+            available_indices = sorted(i for i in (f.result() for f in as_completed(futures)) if i is not None)
             
         if not available_indices:
             logger.warning("No se detectaron cámaras funcionales.")
@@ -202,6 +469,28 @@ class MainWindow(QMainWindow):
             logger.info(f"Cámaras funcionales detectadas: {available_indices}")
             
         return available_indices
+
+    def _detect_cameras_at_startup(self, max_idx_to_check: int) -> list[int]:
+        """
+        Reutiliza la lista de cámaras de la última detección ('last_detected') si la cámara
+        que se va a usar sigue respondiendo, con una sola sonda en lugar de probar todos
+        los índices. Si no hay lista guardada o la sonda falla, hace el escaneo completo
+        y guarda el resultado.
+        """
+        camera_settings = self.config['camera_settings']
+        cached = camera_settings.get('last_detected') or []
+        if cached:
+            preferred = camera_settings.get('camera_index', 0)
+            if preferred not in cached:
+                preferred = cached[0]
+            if self._probe_camera(preferred) is not None:
+                logger.info(f"Usando la lista de cámaras de la última detección: {cached}")
+                return list(cached)
+            logger.info(f"La cámara {preferred} de la última detección no responde; se buscan cámaras de nuevo.")
+
+        available = self._detect_available_cameras(max_idx_to_check)
+        ConfigManager.get().set('camera_settings.last_detected', available)
+        return available
         
     def _create_left_panel(self) -> QWidget:
         panel = QWidget(); layout = QVBoxLayout(panel); layout.setSpacing(15)
@@ -298,9 +587,9 @@ class MainWindow(QMainWindow):
         kpi_layout.addRow("Total de Eventos:", self.kpi_total_events_label); kpi_layout.addRow("Evento Más Frecuente:", self.kpi_most_frequent_label)
         kpi_layout.addRow("Hora Pico de Fatiga:", self.kpi_peak_hour_label); main_layout.addWidget(kpi_group)
         log_group = QGroupBox("Historial de Eventos Detallado"); log_layout = QVBoxLayout(log_group)
-        self.report_table = QTableWidget(); self.report_table.setColumnCount(4); self.report_table.setHorizontalHeaderLabels(["Fecha y Hora", "Usuario", "Tipo de Evento", "Detalles"])
+        self.report_model = EventsModel(); self.report_table = QTableView(); self.report_table.setModel(self.report_model)
         self.report_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents); self.report_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
-        self.report_table.setEditTriggers(QTableWidget.NoEditTriggers); self.report_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.report_table.setEditTriggers(QAbstractItemView.NoEditTriggers); self.report_table.setSelectionBehavior(QAbstractItemView.SelectRows)
         log_layout.addWidget(self.report_table); main_layout.addWidget(log_group, 1)
         return analytics_widget
 
@@ -486,14 +775,14 @@ class MainWindow(QMainWindow):
 
         log_group = QGroupBox("Historial de Eventos Detallado")
         log_layout = QVBoxLayout(log_group)
-        self.report_table = QTableWidget()
-        self.report_table.setColumnCount(4)
-        self.report_table.setHorizontalHeaderLabels(["Fecha y Hora", "Usuario", "Tipo de Evento", "Detalles"])
+        self.report_model = EventsModel()
+        self.report_table = QTableView()
+        self.report_table.setModel(self.report_model)
         self.report_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
         self.report_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
         self.report_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
-        self.report_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.report_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.report_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.report_table.setSelectionBehavior(QAbstractItemView.SelectRows)
         log_layout.addWidget(self.report_table)
         main_layout.addWidget(log_group, 1)
 
@@ -508,13 +797,35 @@ class MainWindow(QMainWindow):
         Carga la lista de usuarios desde la base de datos y la puebla en el QListWidget.
         Maneja el modo de privacidad para mostrar fotos o íconos genéricos.
         También puebla el ComboBox de la pestaña de analíticas.
+
+        Las filas de la lista se reutilizan por user_id entre recargas: solo se crean las
+        de usuarios nuevos y se eliminan las de usuarios borrados; en el resto se
+        actualizan el texto y la imagen.
         """
-        self.user_list_widget.clear()
+        self._thumb_labels.clear()
         self.analytics_user_combo.clear()
         self.analytics_user_combo.addItem("Todos los Usuarios", 0) # userData = 0 para todos
 
         try:
             users = self.db_manager.get_user_details_for_list()
+            user_ids = [user['id'] for user in users]
+            user_id_set = set(user_ids)
+
+            # Las filas conservadas deben seguir en el mismo orden relativo; si no, se reconstruye todo
+            kept_ids = [user_id for user_id in user_ids if user_id in self._user_widgets]
+            current_order = sorted(self._user_widgets, key=lambda uid: self.user_list_widget.row(self._user_widgets[uid][0]))
+            if [uid for uid in current_order if uid in user_id_set] != kept_ids:
+                self._user_widgets.clear()
+                self.user_list_widget.clear()
+            else:
+                # Quitar las filas de usuarios eliminados y las que no son de usuarios (avisos)
+                for stale_id in self._user_widgets.keys() - user_id_set:
+                    del self._user_widgets[stale_id]
+                kept_items = {id(entry[0]) for entry in self._user_widgets.values()}
+                for row in reversed(range(self.user_list_widget.count())):
+                    if id(self.user_list_widget.item(row)) not in kept_items:
+                        self.user_list_widget.takeItem(row)
+
             if not users:
                 no_user_item = QListWidgetItem("No hay usuarios registrados.")
                 no_user_item.setTextAlignment(Qt.AlignCenter)
@@ -522,69 +833,203 @@ class MainWindow(QMainWindow):
                 self.user_list_widget.addItem(no_user_item)
                 return
 
-            for user in users:
+            # Un solo listado por carpeta de fotos (normalmente solo 'rostros_capturados')
+            # en lugar de un stat() por usuario
+            photo_entries = self._scan_photo_dirs(user.get('ruta_imagen') for user in users) if self.photos_are_visible else {}
+
+            for row, user in enumerate(users):
                 user_id = user['id']
                 user_code = user['codigo_usuario']
                 image_path = user.get('ruta_imagen')
 
                 # --- Poblar la lista de la GUI principal ---
-                item_widget = QWidget()
-                item_layout = QHBoxLayout(item_widget)
-                item_layout.setContentsMargins(5, 5, 5, 5)
-                item_layout.setSpacing(10)
-
-                image_label = UserImageLabel(user_id, user_code, image_path or "", self)
-                image_label.setFixedSize(QSize(64, 64))
-                image_label.setStyleSheet("border: 1px solid #555; border-radius: 5px; background-color: #3C3C3C;")
-                image_label.setAlignment(Qt.AlignCenter)
-                
-                image_label.viewUserDetails.connect(self.view_user_details)
-                image_label.deleteUser.connect(self.delete_user)
-
-                if self.photos_are_visible and image_path and os.path.exists(image_path):
-                    pixmap = QPixmap(image_path)
-                    if not pixmap.isNull():
-                        image_label.setPixmap(pixmap.scaled(QSize(64, 64), Qt.KeepAspectRatio, Qt.SmoothTransformation))
-                    else:
-                        image_label.setText("Error\nImg")
-                        image_label.setStyleSheet(image_label.styleSheet() + "color: red;")
+                entry = self._user_widgets.get(user_id)
+                if entry is None:
+                    entry = self._create_user_row(user_id, user_code, image_path or "", row)
+                    self._user_widgets[user_id] = entry
+                _, image_label, text_label = entry
+                image_label.user_code = user_code
+                image_label.image_path = image_path or ""
+                text_label.setText(f"<b>{user_code}</b><br/><small>(ID: {user_id})</small>")
+
+                mtime = None
+                dir_entry = photo_entries.get(os.path.dirname(image_path), {}).get(os.path.basename(image_path)) if image_path else None
+                if dir_entry is not None:
+                    try:
+                        mtime = dir_entry.stat().st_mtime  # En Windows viene del propio listado, sin syscall extra
+                    except OSError:
+                        pass
+
+                cached = self._thumb_cache.get(user_id)
+                if mtime is not None and cached and cached[0] == image_path and cached[1] == mtime:
+                    image_label.setPixmap(cached[2])
                 else:
-                    placeholder_icon = self.style().standardIcon(QStyle.SP_UserIcon)
-                    image_label.setPixmap(placeholder_icon.pixmap(QSize(50, 50)))
-
-                text_label = QLabel(f"<b>{user_code}</b><br/><small>(ID: {user_id})</small>")
-                text_label.setWordWrap(True)
-
-                item_layout.addWidget(image_label)
-                item_layout.addWidget(text_label, 1)
-
-                list_item = QListWidgetItem(self.user_list_widget)
-                list_item.setSizeHint(item_widget.sizeHint())
-                self.user_list_widget.addItem(list_item)
-                self.user_list_widget.setItemWidget(list_item, item_widget)
+                    image_label.setPixmap(self._user_placeholder_pixmap)
+                    if mtime is not None:
+                        # La foto se decodifica en el pool y sustituye al ícono al terminar
+                        self._thumb_labels[user_id] = image_label
+                        QThreadPool.globalInstance().start(ThumbTask(user_id, image_path, mtime, self._thumb_signals))
                 
                 # --- Poblar el ComboBox de la pestaña de analíticas ---
                 self.analytics_user_combo.addItem(user_code, user_id)
 
+            # Descartar miniaturas de usuarios que ya no existen
+            for stale_id in self._thumb_cache.keys() - user_id_set:
+                del self._thumb_cache[stale_id]
+
         except Exception as e:
             logger.error(f"Error al cargar la lista de usuarios: {e}", exc_info=True)
+            self._user_widgets.clear()
+            self.user_list_widget.clear()
             self.user_list_widget.addItem("Error al cargar usuarios.")
 
+    def _create_user_row(self, user_id: int, user_code: str, image_path: str, row: int) -> Tuple[QListWidgetItem, UserImageLabel, QLabel]:
+        """Crea la fila (miniatura y texto) de un usuario en la posición 'row' de la lista."""
+        item_widget = QWidget()
+        item_layout = QHBoxLayout(item_widget)
+        item_layout.setContentsMargins(5, 5, 5, 5)
+        item_layout.setSpacing(10)
+
+        image_label = UserImageLabel(user_id, user_code, image_path, self)
+        image_label.setFixedSize(QSize(THUMB_SIZE, THUMB_SIZE))
+        image_label.setStyleSheet("border: 1px solid #555; border-radius: 5px; background-color: #3C3C3C;")
+        image_label.setAlignment(Qt.AlignCenter)
+
+        image_label.viewUserDetails.connect(self.view_user_details)
+        image_label.deleteUser.connect(self.delete_user)
+
+        text_label = QLabel(f"<b>{user_code}</b><br/><small>(ID: {user_id})</small>")
+        text_label.setWordWrap(True)
+
+        item_layout.addWidget(image_label)
+        item_layout.addWidget(text_label, 1)
+
+        list_item = QListWidgetItem()
+        self.user_list_widget.insertItem(row, list_item)
+        list_item.setSizeHint(item_widget.sizeHint())
+        self.user_list_widget.setItemWidget(list_item, item_widget)
+        return list_item, image_label, text_label
+
+    @staticmethod
+    def _scan_photo_dirs(image_paths) -> Dict[str, Dict[str, os.DirEntry]]:
+        """Lista una vez cada carpeta que contiene fotos: {carpeta: {nombre_fichero: DirEntry}}."""
+        entries: Dict[str, Dict[str, os.DirEntry]] = {}
+        for directory in {os.path.dirname(path) for path in image_paths if path}:
+            try:
+                with os.scandir(directory or '.') as it:
+                    entries[directory] = {entry.name: entry for entry in it}
+            except OSError:
+                entries[directory] = {}
+        return entries
+
+    def _on_thumb_ready(self, user_id: int, image_path: str, mtime: float, image: QImage):
+        """Coloca la miniatura decodificada en segundo plano en su etiqueta de la lista."""
+        label = self._thumb_labels.get(user_id)
+        if label is None or label.image_path != image_path:
+            return  # La lista se recargó mientras tanto
+        del self._thumb_labels[user_id]
+        if image.isNull():
+            label.setText("Error\nImg")
+            label.setStyleSheet(label.styleSheet() + "color: red;")
+            return
+        pixmap = QPixmap.fromImage(image)
+        self._thumb_cache[user_id] = (image_path, mtime, pixmap)
+        label.setPixmap(pixmap)
+
+    def view_user_details(self, user_id: int):
+        """Muestra el código, el ID y la foto de registro (si las fotos son visibles) de un usuario."""
+        entry = self._user_widgets.get(user_id)
+        if entry is None:
+            return
+        image_label = entry[1]
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Detalles del Usuario")
+        msg_box.setText(f"<b>{image_label.user_code}</b><br/>ID: {user_id}")
+        cached = self._thumb_cache.get(user_id)
+        if self.photos_are_visible and cached:
+            msg_box.setIconPixmap(cached[2])
+        msg_box.setStandardButtons(QMessageBox.Ok)
+        msg_box.exec_()
+
+    def delete_user(self, user_id: int):
+        """Elimina un usuario (con clave de administrador y confirmación) junto con sus fotos."""
+        password, ok = QInputDialog.getText(self, "Acceso Restringido", "Introduzca la clave de administrador:", QLineEdit.Password)
+        if not ok or not password:
+            return
+        if not ConfigManager.verify_password(password):
+            QMessageBox.warning(self, "Acceso Denegado", "La clave es incorrecta.")
+            return
+        entry = self._user_widgets.get(user_id)
+        user_code = entry[1].user_code if entry else str(user_id)
+        answer = QMessageBox.question(self, "Eliminar Usuario",
+                                      f"¿Eliminar al usuario '{user_code}' y todos sus registros?",
+                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if answer != QMessageBox.Yes:
+            return
+
+        success, image_paths = self.db_manager.delete_user(user_id)
+        if not success:
+            QMessageBox.critical(self, "Error", f"No se pudo eliminar al usuario '{user_code}'.")
+            return
+        for path in image_paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"No se pudo borrar la imagen {path}: {e}")
+        self._known_embeddings = None
+        if self.current_user_id == user_id:
+            self._logout_user()
+        self.load_users_to_list()
+
     def _populate_event_tree(self):
-        """Puebla el árbol de eventos de fatiga con los eventos configurados y su estado."""
-        self.fatigue_event_tree.clear()
+        """
+        Puebla el árbol de eventos de fatiga con los eventos configurados y su estado.
+        Si los eventos configurados son los mismos que ya tiene el árbol (p. ej. al guardar
+        ajustes), solo se actualiza la columna de estado de los ítems existentes.
+        """
         event_toggles = self.config.get('event_toggles', {})
+        if self._event_items and self._event_items.keys() == event_toggles.keys():
+            for event_name, item in self._event_items.items():
+                self._set_event_toggle_item(item, event_toggles.get(event_name, False))
+            return
+
+        self.fatigue_event_tree.clear()
+        self._event_items.clear()
         for event_name in sorted(event_toggles.keys()):
-            is_enabled = event_toggles.get(event_name, False)
-            
             item = QTreeWidgetItem(self.fatigue_event_tree)
+            self._event_items[event_name] = item
             item.setText(0, event_name)
-            item.setText(1, "✓" if is_enabled else "✗")
-            item.setForeground(1, Qt.green if is_enabled else Qt.red)
+            self._set_event_toggle_item(item, event_toggles.get(event_name, False))
             item.setToolTip(1, "Haga doble clic para cambiar el estado de detección de este evento.")
             
-            item.setText(2, str(self.fatigue_event_counts.get(event_name, 0)))
+            item.setText(2, str(self._event_count(event_name)))
             item.setTextAlignment(2, Qt.AlignCenter)
+
+    @staticmethod
+    def _set_event_toggle_item(item: QTreeWidgetItem, is_enabled: bool):
+        """Muestra en la columna de estado si la detección del evento está activada."""
+        item.setText(1, "✓" if is_enabled else "✗")
+        item.setForeground(1, Qt.green if is_enabled else Qt.red)
+
+    def _event_count(self, event_name: str) -> int:
+        """Veces que se ha detectado 'event_name' en la sesión (0 si no es un evento contable)."""
+        code = EVENT_CODE.get(event_name)
+        return 0 if code is None else self.fatigue_event_counts[code]
+
+    def _refresh_event_counts(self, event_names=None):
+        """
+        Actualiza la columna 'Cantidad' directamente en los ítems ya creados (todos, o solo
+        los de 'event_names'), sin reconstruir el árbol y con un único repintado.
+        """
+        names = self._event_items.keys() if event_names is None else event_names
+        self.fatigue_event_tree.setUpdatesEnabled(False)
+        try:
+            for name in names:
+                item = self._event_items.get(name)
+                if item is not None:
+                    item.setText(2, str(self._event_count(name)))
+        finally:
+            self.fatigue_event_tree.setUpdatesEnabled(True)
     
     def trigger_first_run_setup(self):
         """
@@ -619,7 +1064,7 @@ class MainWindow(QMainWindow):
             return
             
         recovery_code = ConfigManager.set_new_password(new_pass)
-        self.config = ConfigManager.load_full_config() # Recargar la config con la nueva clave
+        self.config = ConfigManager.get().reload() # Recargar la config con la nueva clave
         
         msg_box = QMessageBox(self)
         msg_box.setIcon(QMessageBox.Information)
@@ -687,7 +1132,9 @@ class MainWindow(QMainWindow):
                 return
                 
             model_name = self.config['recognition_settings']['model_filename']
-            known_embs = self.db_manager.get_all_user_embeddings(model_name)
+            if self._known_embeddings is None or self._known_embeddings[0] != model_name:
+                self._known_embeddings = (model_name, self.db_manager.get_all_user_embeddings(model_name))
+            known_embs = self._known_embeddings[1]
             threshold = self.config['recognition_settings']['threshold']
             
             match, similarity = self.face_processor.find_match(query_emb, known_embs, threshold)
@@ -779,6 +1226,16 @@ class MainWindow(QMainWindow):
         # Actualizar el temporizador de inactividad
         self.inactivity_timer = time.time()
 
+    def _save_enrichment_sample(self, user_id: int, image_path: str, image: np.ndarray, emb: np.ndarray,
+                                model_name: str, pose_data: Tuple):
+        """Guarda la foto y el embedding de una muestra de enriquecimiento (en el hilo de escritura)."""
+        try:
+            cv2.imwrite(image_path, image)
+            self.db_manager.add_user_embedding(user_id, emb, image_path, model_name, pose_data)
+            self._known_embeddings = None
+        except Exception as e:
+            logger.error(f"Error al guardar la muestra de enriquecimiento de {image_path}: {e}", exc_info=True)
+
     def _execute_auto_registration(self, frame, face_landmarks, pose_data):
         """Contiene la lógica completa para crear un nuevo usuario y sus datos."""
         try:
@@ -799,6 +1256,7 @@ class MainWindow(QMainWindow):
                 image_path = os.path.join("rostros_capturados", f"{new_user_code}_{int(time.time())}.png")
                 cv2.imwrite(image_path, aligned_face_img)
                 self.db_manager.add_user_embedding(new_user_id, emb, image_path, self.config['recognition_settings']['model_name'], pose_data)
+                self._known_embeddings = None
                 
                 logger.info(f"Nuevo usuario '{new_user_code}' registrado automáticamente.")
                 QMessageBox.information(self, "Registro Automático", f"Nuevo usuario '{new_user_code}' ha sido registrado en el sistema.")
@@ -815,8 +1273,8 @@ class MainWindow(QMainWindow):
         """Prepara todas las variables para una nueva sesión de monitoreo."""
         logger.info(f"Preparando nueva sesión de monitoreo para {self.current_user_code}.")
         self.fatigue_processor.reset_state()
-        self.fatigue_event_counts.clear()
-        self._populate_event_tree()
+        self.fatigue_event_counts = [0] * len(EVENT_NAMES)
+        self._refresh_event_counts()
         
         self.state_timers['enrichment_start_time'] = time.time()
         self.state_timers['session_embeddings_captured'] = 0
@@ -824,7 +1282,7 @@ class MainWindow(QMainWindow):
         self.last_monitoring_data = {}
         
         self.is_calibrating = False
-        self.calibration_frames_data = []
+        self._calibration_count = 0
         self.fatigue_processor.calibration_data = None
 
     def _login_user(self, user_id, user_code, similarity):
@@ -856,8 +1314,8 @@ class MainWindow(QMainWindow):
         self.app_state = "LISTENING"
         self.state_timers['face_lost_counter'] = 0
         self.fatigue_processor.reset_state()
-        self.fatigue_event_counts.clear()
-        self._populate_event_tree()
+        self.fatigue_event_counts = [0] * len(EVENT_NAMES)
+        self._refresh_event_counts()
         
         if not is_user_present:
             self.state_timers['face_lost_counter'] += 1
@@ -879,23 +1337,24 @@ class MainWindow(QMainWindow):
             else:
                 logger.info(f"No se encontraron datos de calibración. Iniciando calibración en tiempo real.")
                 self.is_calibrating = True
-                self.calibration_frames_data = []
+                self._calibration_count = 0
                 self.status_label.setText(f"CALIBRANDO para {self.current_user_code}...")
         
         if self.is_calibrating:
             cal_metrics = self.fatigue_processor.process_frame_for_calibration(face_results, frame.shape[:2])
             if cal_metrics:
-                self.calibration_frames_data.append(cal_metrics)
+                self._calibration_buf[self._calibration_count] = [cal_metrics[name] for name in CALIBRATION_METRICS]
+                self._calibration_count += 1
             
             # Recopilar datos durante aprox. 5 segundos (asumiendo ~20fps)
-            if len(self.calibration_frames_data) >= 100:
-                df = pd.DataFrame(self.calibration_frames_data)
-                final_cal_data = {
-                    'cal_ear_mean': df['ear'].mean(), 'cal_ear_std': df['ear'].std(),
-                    'cal_mar_mean': df['mar'].mean(), 'cal_mar_std': df['mar'].std(),
-                    'cal_puc_mean': df['puc'].mean(), 'cal_puc_std': df['puc'].std(),
-                    'cal_moe_mean': df['moe'].mean(), 'cal_moe_std': df['moe'].std(),
-                }
+            if self._calibration_count >= CALIBRATION_FRAMES:
+                # Media y desviación estándar muestral (ddof=1) por columna
+                means = self._calibration_buf.mean(axis=0)
+                stds = self._calibration_buf.std(axis=0, ddof=1)
+                final_cal_data = {}
+                for name, mean, std in zip(CALIBRATION_METRICS, means.tolist(), stds.tolist()):
+                    final_cal_data[f'cal_{name}_mean'] = mean
+                    final_cal_data[f'cal_{name}_std'] = std
                 self.fatigue_processor.set_calibration(final_cal_data)
                 self.db_manager.save_calibration_data(self.current_user_id, final_cal_data)
                 self.is_calibrating = False
@@ -914,8 +1373,8 @@ class MainWindow(QMainWindow):
                     # Comprobar si la pose es suficientemente nueva
                     is_new_pose = True
                     if self.state_timers['session_captured_poses']:
-                        current_pose_np = np.array(pose_data)
-                        min_dist = min([np.linalg.norm(current_pose_np - p) for p in self.state_timers['session_captured_poses']])
+                        # Pocas poses de 3 ángulos: math.dist sobre tuplas evita crear arrays por frame
+                        min_dist = min(math.dist(pose_data, p) for p in self.state_timers['session_captured_poses'])
                         if min_dist < enrich_config.get('min_pose_difference_threshold', 15.0):
                             is_new_pose = False
                     
@@ -927,10 +1386,12 @@ class MainWindow(QMainWindow):
                             emb = self.face_processor.get_embedding(aligned_blob)
                             if emb is not None:
                                 image_path = os.path.join("rostros_capturados", f"{self.current_user_code}_extra_{int(time.time())}.png")
-                                cv2.imwrite(image_path, aligned_face_img)
-                                self.db_manager.add_user_embedding(self.current_user_id, emb, image_path, self.config['recognition_settings']['model_filename'], pose_data)
+                                self._profile_writer.submit(
+                                    self._save_enrichment_sample, self.current_user_id, image_path, aligned_face_img, emb,
+                                    self.config['recognition_settings']['model_filename'], pose_data
+                                )
                                 
-                                self.state_timers['session_captured_poses'].append(np.array(pose_data))
+                                self.state_timers['session_captured_poses'].append(tuple(pose_data))
                                 self.state_timers['session_embeddings_captured'] += 1
                                 logger.info(f"Embedding de enriquecimiento #{self.state_timers['session_embeddings_captured']} guardado para {self.current_user_code}.")
                                 self.status_label.setText("Perfil facial mejorado...")
@@ -968,6 +1429,38 @@ class MainWindow(QMainWindow):
 
     # --- LÓGICA DE ACTUALIZACIÓN DE LA INTERFAZ GRÁFICA ---
 
+    def _show_frame(self, frame_bgr: np.ndarray, mirror: bool = False, fit_to_label: bool = False):
+        """
+        Muestra un frame BGR en el QLabel de video. Con Qt >= 5.14 el QImage envuelve
+        directamente el buffer de OpenCV en formato BGR888, sin conversión de color. Si
+        hace falta espejo, o con versiones anteriores de Qt (conversión a RGB), el
+        resultado se escribe en un buffer persistente que un QImage ya construido envuelve
+        sin copiar, así que por frame solo se crea el QPixmap.
+        """
+        h, w = frame_bgr.shape[:2]
+        if QIMAGE_FORMAT_BGR888 is not None and not mirror and frame_bgr.flags['C_CONTIGUOUS']:
+            image = QImage(frame_bgr.data, w, h, frame_bgr.strides[0], QIMAGE_FORMAT_BGR888)
+        else:
+            if self._display_buf is None or self._display_buf.shape[:2] != (h, w):
+                self._display_buf = np.empty((h, w, 3), dtype=np.uint8)
+                self._display_qimage = QImage(self._display_buf.data, w, h, 3 * w,
+                                              QIMAGE_FORMAT_BGR888 or QImage.Format_RGB888)
+            if QIMAGE_FORMAT_BGR888 is not None:
+                if mirror:
+                    cv2.flip(frame_bgr, 1, dst=self._display_buf)
+                else:
+                    np.copyto(self._display_buf, frame_bgr)
+            else:
+                cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=self._display_buf)
+                if mirror:
+                    cv2.flip(self._display_buf, 1, dst=self._display_buf)
+            image = self._display_qimage
+        # fromImage copia los píxeles, así que el frame o el buffer pueden reescribirse después
+        pixmap = QPixmap.fromImage(image)
+        if fit_to_label:
+            pixmap = pixmap.scaled(self.camera_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.camera_label.setPixmap(pixmap)
+
     def _update_display(self, frame: np.ndarray, face_results: Any):
         """
         Actualiza el widget de video. Si el video es visible, aplica los overlays
@@ -981,32 +1474,20 @@ class MainWindow(QMainWindow):
             pose_data = PoseEstimator.estimate_head_pose(frame.shape[:2], face_results.multi_face_landmarks[0])
 
         # Dibuja todas las capas de información sobre el fotograma
-        final_frame = self._draw_frame_overlays(frame, face_results, None, None, pose_data, self.last_monitoring_data)
+        self._draw_landmark_overlays(frame, face_results, None, None)
+        cv2.flip(frame, 1, dst=frame)
+        final_frame = self._draw_frame_overlays(frame, pose_data, self.last_monitoring_data)
         
-        # Convierte el fotograma de formato OpenCV (BGR) a formato Qt (RGB) y lo muestra
+        # Muestra el fotograma de OpenCV (BGR) en el QLabel
         try:
-            h, w, ch = final_frame.shape
-            bytes_per_line = ch * w
-            q_image = QImage(final_frame.data, w, h, bytes_per_line, QImage.Format_BGR888).rgbSwapped()
-            pixmap = QPixmap.fromImage(q_image)
-            self.camera_label.setPixmap(pixmap)
+            self._show_frame(final_frame)
         except Exception as e:
             logger.error(f"Error al convertir y mostrar el fotograma: {e}")
 
-    def _draw_frame_overlays(self, frame: np.ndarray, face_results: Any, hand_results: Any, pose_results: Any, pose_data: Optional[Tuple], overlay_data: Dict) -> np.ndarray:
+    def _draw_landmark_overlays(self, frame: np.ndarray, face_results: Any, hand_results: Any, pose_results: Any) -> np.ndarray:
         """
-        Dibuja toda la información visual sobre un fotograma.
-        
-        Args:
-            frame: El fotograma de entrada en formato BGR
-            face_results: Resultados de la detección facial de MediaPipe
-            hand_results: Resultados de la detección de manos de MediaPipe
-            pose_results: Resultados de la detección de postura de MediaPipe
-            pose_data: Tupla con los ángulos de rotación de la cabeza (pitch, yaw, roll)
-            overlay_data: Diccionario con datos adicionales para mostrar
-            
-        Returns:
-            El fotograma con los overlays dibujados
+        Dibuja los landmarks de MediaPipe (malla facial, manos y pose) sobre el fotograma.
+        Debe llamarse antes de aplicar el efecto espejo, ya que usa las coordenadas del frame original.
         """
         # Dibujar malla facial si hay un rostro detectado
         if self.app_state != "REPOSO" and face_results and face_results.multi_face_landmarks:
@@ -1014,6 +1495,7 @@ class MainWindow(QMainWindow):
 
         # Opcional: Dibujar landmarks de manos y pose (para depuración o visualización)
         if self.app_state != "REPOSO" and hand_results and hand_results.multi_hand_landmarks:
+            import mediapipe as mp
             for hand_landmarks in hand_results.multi_hand_landmarks:
                 self.face_processor.mp_drawing.draw_landmarks(
                     frame, hand_landmarks, mp.solutions.hands.HAND_CONNECTIONS,
@@ -1022,11 +1504,26 @@ class MainWindow(QMainWindow):
                 )
                 
         if self.app_state != "REPOSO" and pose_results and pose_results.pose_landmarks:
+            import mediapipe as mp
             self.face_processor.mp_drawing.draw_landmarks(
                 frame, pose_results.pose_landmarks, mp.solutions.pose.POSE_CONNECTIONS,
                 self.face_processor.mp_drawing_styles.get_default_pose_landmarks_style()
             )
 
+        return frame
+
+    def _draw_frame_overlays(self, frame: np.ndarray, pose_data: Optional[Tuple], overlay_data: Dict) -> np.ndarray:
+        """
+        Dibuja la información de texto y alertas sobre un fotograma ya espejado.
+        
+        Args:
+            frame: El fotograma de entrada en formato BGR
+            pose_data: Tupla con los ángulos de rotación de la cabeza (pitch, yaw, roll)
+            overlay_data: Diccionario con datos adicionales para mostrar
+            
+        Returns:
+            El fotograma con los overlays dibujados
+        """
         # Dibujar estado actual de la aplicación
         status_text = f"ESTADO: {self.app_state}"
         if self.app_state == "MONITORING" and self.current_user_code:
@@ -1074,17 +1571,30 @@ class MainWindow(QMainWindow):
         return frame
 
     def update_facial_metrics_display(self, metrics: Dict):
-        """Actualiza las etiquetas del panel de métricas."""
-        self.ear_label.setText(f"{metrics.get('ear', 0):.3f}")
-        self.mar_label.setText(f"{metrics.get('mar', 0):.3f}")
-        self.puc_label.setText(f"{metrics.get('puc', 0):.3f}")
-        self.moe_label.setText(f"{metrics.get('moe', 0):.3f}")
+        """
+        Actualiza las etiquetas del panel de métricas. Se llama en cada frame, pero los
+        textos solo se aplican cuando vence _flush_timer (10 Hz): a la tasa de la cámara
+        no se pueden leer y cada setText invalida el layout.
+        """
+        self._label_updates[self.ear_label] = f"{metrics.get('ear', 0):.3f}"
+        self._label_updates[self.mar_label] = f"{metrics.get('mar', 0):.3f}"
+        self._label_updates[self.puc_label] = f"{metrics.get('puc', 0):.3f}"
+        self._label_updates[self.moe_label] = f"{metrics.get('moe', 0):.3f}"
+
+    def _flush_labels(self):
+        """Aplica el último texto pendiente de cada etiqueta."""
+        for label, text in self._label_updates.items():
+            label.setText(text)
+        self._label_updates.clear()
 
     def update_fatigue_event_log(self, events: List[str]):
         """Actualiza el árbol de eventos de fatiga con nuevos eventos detectados."""
+        counts = self.fatigue_event_counts
         for event in events:
-            self.fatigue_event_counts[event] += 1
-        self._populate_event_tree()
+            code = EVENT_CODE.get(event)
+            if code is not None:
+                counts[code] += 1
+        self._refresh_event_counts(events)
 
     # --- SLOTS Y MANEJADORES DE EVENTOS DE USUARIO ---
 
@@ -1102,7 +1612,7 @@ class MainWindow(QMainWindow):
     def _on_settings_saved(self):
         """Recarga la configuración después de que se haya guardado."""
         logger.info("Recargando configuración en la ventana principal tras guardado.")
-        self.config = ConfigManager.load_full_config()
+        self.config = ConfigManager.get().reload()
         self.fatigue_processor = FatigueProcessor(self.config)
         self._populate_event_tree()
         QMessageBox.information(self, "Configuración", "Los ajustes se han guardado.\nAlgunos cambios pueden requerir un reinicio de la sesión de monitoreo.")
@@ -1144,11 +1654,11 @@ class MainWindow(QMainWindow):
         if event_name in self.config['event_toggles']:
             current_status = self.config['event_toggles'][event_name]
             new_status = not current_status
-            self.config['event_toggles'][event_name] = new_status
-            ConfigManager.save_full_config(self.config)
+            config_store = ConfigManager.get()
+            config_store.set(f'event_toggles.{event_name}', new_status)
+            config_store.flush()
             
-            item.setText(1, "✓" if new_status else "✗")
-            item.setForeground(1, Qt.green if new_status else Qt.red)
+            self._set_event_toggle_item(item, new_status)
             logger.info(f"El evento '{event_name}' ha sido {'habilitado' if new_status else 'deshabilitado'}.")
 
     def _handle_generate_report(self):
@@ -1165,6 +1675,9 @@ class MainWindow(QMainWindow):
         self.analytics_worker.moveToThread(self.analytics_worker_thread)
         self.analytics_worker.finished.connect(self._on_report_finished)
         self.analytics_worker.error.connect(self._on_report_error)
+        self.analytics_worker.progress.connect(
+            lambda n: self.generate_report_button.setText(f"Generando... ({n} eventos)")
+        )
         self.analytics_worker_thread.started.connect(self.analytics_worker.run)
         self.analytics_worker_thread.finished.connect(self.analytics_worker_thread.deleteLater)
         self.analytics_worker_thread.start()
@@ -1187,12 +1700,11 @@ class MainWindow(QMainWindow):
         ph_hour, ph_count = kpis.get('peak_hour', ("N/A", 0))
         self.kpi_peak_hour_label.setText(f"{ph_hour:02d}:00 - {ph_hour+1:02d}:00 ({ph_count} eventos)")
 
-        self.report_table.setRowCount(len(events_data))
-        for row_idx, event in enumerate(events_data):
-            self.report_table.setItem(row_idx, 0, QTableWidgetItem(event.get('fecha_hora', '')))
-            self.report_table.setItem(row_idx, 1, QTableWidgetItem(event.get('codigo_usuario', 'N/A')))
-            self.report_table.setItem(row_idx, 2, QTableWidgetItem(event.get('tipo_evento', '')))
-            self.report_table.setItem(row_idx, 3, QTableWidgetItem(str(event.get('duracion_seg', '')) if event.get('duracion_seg') else ''))
+        # El modelo envuelve la lista tal cual; la vista solo consulta las filas visibles
+        # (el modelo anterior se libera solo después de que la vista deje de usarlo)
+        model = EventsModel(events_data)
+        self.report_table.setModel(model)
+        self.report_model = model
         
         logger.info(f"Reporte generado y mostrado con {len(events_data)} eventos.")
 
@@ -1253,8 +1765,9 @@ class MainWindow(QMainWindow):
             time.sleep(0.5)
         
         self.camera_index = new_camera
-        self.config['camera_settings']['camera_index'] = self.camera_index
-        ConfigManager.save_full_config(self.config)
+        config_store = ConfigManager.get()
+        config_store.set('camera_settings.camera_index', self.camera_index)
+        config_store.flush()
         
         if was_capturing:
             self.start_camera()
@@ -1274,13 +1787,13 @@ class MainWindow(QMainWindow):
         try:
             max_idx_to_check = self.config['camera_settings'].get('MAX_CAMERA_INDEX_TO_CHECK', 4)
             self.available_cameras = self._detect_available_cameras(max_idx_to_check)
+            ConfigManager.get().set('camera_settings.last_detected', self.available_cameras)
             
             # Actualizar el índice de cámara actual si es necesario
             if self.available_cameras:
                 if self.camera_index not in self.available_cameras:
                     self.camera_index = self.available_cameras[0]
-                    self.config['camera_settings']['camera_index'] = self.camera_index
-                    ConfigManager.save_full_config(self.config)
+                    ConfigManager.get().set('camera_settings.camera_index', self.camera_index)
             else:
                 self.camera_index = -1
             
@@ -1328,7 +1841,8 @@ class MainWindow(QMainWindow):
                 self.camera_index, 
                 self, 
                 frame_width=frame_width,
-                frame_height=frame_height
+                frame_height=frame_height,
+                low_latency=self.config['camera_settings'].get('low_latency', True)
             )
             self.camera_thread.update_frame.connect(self.process_frame)
             self.camera_thread.error.connect(self._on_camera_error)
@@ -1406,17 +1920,15 @@ class MainWindow(QMainWindow):
 
     def process_frame(self, frame_bgr: np.ndarray):
         """
-        Procesa cada fotograma capturado por la cámara, realiza las detecciones
-        de visión artificial y actualiza el estado de la aplicación y la GUI.
+        Recibe cada fotograma capturado por la cámara, aplica el ROI y la exposición y lo
+        envía al hilo de inferencia. Las detecciones llegan a _on_inference_results, que
+        actualiza el estado de la aplicación y la GUI.
         """
         if not hasattr(self, 'face_processor') or not self.face_processor.initialized:
             # Si el procesador facial no está listo, solo muestra el frame si es visible
             if self.video_is_visible:
                 try:
-                    h, w, ch = frame_bgr.shape
-                    bytes_per_line = ch * w
-                    q_image = QImage(frame_bgr.data, w, h, bytes_per_line, QImage.Format_BGR888).rgbSwapped()
-                    self.camera_label.setPixmap(QPixmap.fromImage(q_image))
+                    self._show_frame(frame_bgr, mirror=True)
                 except Exception as e:
                     logger.error(f"Error al mostrar frame sin procesador facial listo: {e}")
             return frame_bgr
@@ -1431,21 +1943,22 @@ class MainWindow(QMainWindow):
             height, width = frame_bgr.shape[:2]
             roi_autoexp.init_centered_roi(width, height, self.config.get('roi_autoexposure_settings', {}).get('CENTER_CONFIG'))
         
-        # Ajustar exposición usando el objeto CAP de la cámara
+        # Ajustar exposición usando el objeto CAP de la cámara. El ROI se dibuja y selecciona
+        # sobre la vista en espejo, mientras que frame_bgr no lo está.
         if 'roi_autoexposure_settings' in self.config and self.camera_thread and self.camera_thread.cap:
-            frame_bgr = roi_autoexp.adjust_exposure(frame_bgr, self.camera_thread.cap, self.config)
+            frame_bgr = roi_autoexp.adjust_exposure(frame_bgr, self.camera_thread.cap, self.config, mirrored_roi=True)
         
-        # 2. Realizar detecciones de MediaPipe
-        # Convertir a RGB para MediaPipe (MediaPipe prefiere RGB)
-        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        frame_rgb.flags.writeable = False  # Optimización de rendimiento para MediaPipe
+        # 2. Las detecciones de MediaPipe (rostro, manos y pose de cuerpo) se hacen en el
+        # hilo de inferencia; el resto del procesamiento sigue en _on_inference_results
+        self._inference_worker.submit(frame_bgr)
 
-        # Realizar todas las detecciones de MediaPipe
-        face_results = self.face_processor.face_mesh.process(frame_rgb)
-        hand_results = self.face_processor.hands.process(frame_rgb)  # Procesar manos
-        pose_results = self.face_processor.pose.process(frame_rgb)    # Procesar pose de cuerpo
-
-        frame_rgb.flags.writeable = True  # Volver a habilitar escritura si se modifica en el futuro
+    def _on_inference_results(self, frame_bgr: np.ndarray, face_results: Any, hand_results: Any, pose_results: Any):
+        """
+        Recibe en el hilo de la GUI los resultados de MediaPipe de un frame, ejecuta la
+        máquina de estados y actualiza la visualización.
+        """
+        if not self.capturing:
+            return  # Resultado de un frame anterior a detener la cámara
 
         # Estimar pose de la cabeza (Pitch, Yaw, Roll)
         pose_data = None
@@ -1465,28 +1978,25 @@ class MainWindow(QMainWindow):
             # No se hace nada en modo reposo con el frame, solo se espera al MPU
             pass  # El MPUThread se encarga de cambiar el estado
 
+        # Con el video oculto no hace falta componer ni convertir la imagen de salida
+        if not self.video_is_visible:
+            return frame_bgr
+
         # 4. Dibujar interfaz de ROI y Overlays
-        # Aquí se dibuja la interfaz de ROI sobre el frame original
-        processed_frame_with_roi = roi_autoexp.draw_roi_interface(frame_bgr.copy())
+        # Los landmarks se dibujan sobre una copia del frame original; después se aplica el
+        # efecto espejo (solo visual) in situ y se dibujan los textos para que sean legibles.
+        display_frame = self._draw_landmark_overlays(frame_bgr.copy(), face_results, hand_results, pose_results)
+        cv2.flip(display_frame, 1, dst=display_frame)
+        processed_frame_with_roi = roi_autoexp.draw_roi_interface(display_frame)
         
-        # Dibujar overlays de detección (malla facial, textos, alertas, etc.)
-        final_display_frame = self._draw_frame_overlays(
-            processed_frame_with_roi, face_results, hand_results, pose_results, pose_data, self.last_monitoring_data
-        )
+        # Dibujar overlays de texto (estado, métricas, alertas, etc.)
+        final_display_frame = self._draw_frame_overlays(processed_frame_with_roi, pose_data, self.last_monitoring_data)
         
         # 5. Actualizar la visualización en la GUI
-        if self.video_is_visible:
-            try:
-                h, w, ch = final_display_frame.shape
-                bytes_per_line = ch * w
-                q_image = QImage(final_display_frame.data, w, h, bytes_per_line, QImage.Format_BGR888).rgbSwapped()
-                self.camera_label.setPixmap(QPixmap.fromImage(q_image).scaled(
-                    self.camera_label.size(), 
-                    Qt.KeepAspectRatio, 
-                    Qt.SmoothTransformation
-                ))
-            except Exception as e:
-                logger.error(f"Error al convertir y mostrar el fotograma final: {e}")
+        try:
+            self._show_frame(final_display_frame, fit_to_label=True)
+        except Exception as e:
+            logger.error(f"Error al convertir y mostrar el fotograma final: {e}")
         
         return final_display_frame
 
@@ -1497,4 +2007,9 @@ class MainWindow(QMainWindow):
         if self.mpu_thread and self.mpu_thread.isRunning(): 
             self.mpu_thread.stop()
             self.mpu_thread.wait()
+        self._inference_thread.quit()
+        self._inference_thread.wait()
+        logger.info(f"Frames descartados por la inferencia al ir por detrás de la cámara: {self._inference_worker.frames_dropped}")
+        self._profile_writer.shutdown(wait=True)  # Terminar de guardar las muestras pendientes
+        ConfigManager.get().flush()
         event.accept()               
\ No newline at end of file
@@ -1,54 +1,150 @@
-import torch
+import math
+import os
 import numpy as np
+from logging_setup import logger
+
+# Los dos backends son opcionales: PyTorch para modelos TorchScript (.pth/.pt) y
+# ONNX Runtime para modelos exportados (.onnx), habitual en despliegues solo CPU.
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+SEQUENCE_LENGTH = 20
+NUM_FEATURES = 4  # ear, mar, puc, moe
+# Ventanas de 5 muestras (con solape) sobre las últimas SEQUENCE_LENGTH muestras: (6, 5)
+WINDOW_IDX = np.array([np.arange(start, start + 5) for start in (0, 3, 6, 9, 12, 15)])
+# Para cada posición de escritura del buffer circular, índices de las ventanas en orden cronológico
+_RING_WINDOW_IDX = np.stack([((head + np.arange(SEQUENCE_LENGTH)) % SEQUENCE_LENGTH)[WINDOW_IDX]
+                             for head in range(SEQUENCE_LENGTH)])
+# sigmoid(x) > 0.7 equivale a x > logit(0.7): se compara sin calcular exp (que desborda con logits muy negativos)
+_LOGIT_THRESHOLD = math.log(0.7 / 0.3)
+
 
 class LSTMClassifier:
     """
     Clasificador LSTM para detección de fatiga basado en métricas faciales.
-    
+
     Args:
-        model_path (str): Ruta al modelo LSTM pre-entrenado.
+        model_path (str): Ruta al modelo LSTM pre-entrenado: TorchScript o, si termina
+            en '.onnx', un modelo exportado que se ejecuta con ONNX Runtime.
+        num_threads (int): Hilos intra-op. Con una sola secuencia por frame más hilos
+            solo añaden sincronización; None deja la configuración por defecto.
+        precision (str): 'fp32' o 'fp16'. FP16 solo se usa con PyTorch y GPU CUDA; en
+            CPU el modelo sigue en FP32.
     """
-    def __init__(self, model_path):
-        self.model = torch.jit.load(model_path)
-        self.input_data = []
-        self.model.eval()  # Poner el modelo en modo evaluación
-    
+    WARMUP_ITERATIONS = 2
+    PRECISIONS = ('fp32', 'fp16')
+
+    def __init__(self, model_path, num_threads=1, precision='fp32'):
+        self._buffer = np.zeros((SEQUENCE_LENGTH, NUM_FEATURES), dtype=np.float32)
+        self._head = 0   # Próxima posición de escritura (y muestra más antigua con el buffer lleno)
+        self._count = 0
+
+        self.use_onnx = os.path.splitext(model_path)[1].lower() == '.onnx'
+        if self.use_onnx:
+            self._init_onnx(model_path, num_threads)
+        else:
+            self._init_torch(model_path, num_threads, precision)
+        self._warmup()
+
+    def _init_torch(self, model_path, num_threads, precision):
+        """Carga el modelo TorchScript, optimizado para inferencia."""
+        if not TORCH_AVAILABLE:
+            raise ImportError("PyTorch no está instalado; no se puede cargar el modelo LSTM TorchScript.")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        if precision not in self.PRECISIONS:
+            logger.warning(f"Precisión LSTM desconocida '{precision}', se usa fp32.")
+            precision = 'fp32'
+        self.device = torch.device('cpu')
+        self.dtype = torch.float32
+        if precision == 'fp16':
+            if torch.cuda.is_available():
+                self.device, self.dtype = torch.device('cuda'), torch.float16
+            else:
+                logger.info("FP16 requiere GPU CUDA; el clasificador LSTM se ejecuta en FP32 sobre CPU.")
+
+        model = torch.jit.load(model_path, map_location=self.device)
+        model.eval()  # Poner el modelo en modo evaluación
+        if self.dtype == torch.float16:
+            # Convertir antes de congelar: optimize_for_inference fija los pesos como constantes
+            model = model.half()
+        try:
+            # Congela pesos y atributos y aplica las fusiones de inferencia del JIT
+            model = torch.jit.optimize_for_inference(model)
+        except Exception as e:
+            logger.warning(f"No se pudo optimizar el modelo LSTM para inferencia, se usa sin optimizar: {e}")
+        self.model = model
+
+    def _init_onnx(self, model_path, num_threads):
+        """Crea la sesión de ONNX Runtime (CPU) con todas las optimizaciones de grafo."""
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime no está instalado; no se puede cargar el modelo LSTM ONNX.")
+        opts = ort.SessionOptions()
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+            opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _warmup(self):
+        """Ejecuta pasadas en vacío para que la inicialización perezosa no ocurra en el primer frame real."""
+        dummy = np.zeros((len(WINDOW_IDX), WINDOW_IDX.shape[1], NUM_FEATURES), dtype=np.float32)
+        if self.use_onnx:
+            for _ in range(self.WARMUP_ITERATIONS):
+                self.session.run(None, {self.input_name: dummy})
+            return
+        dummy = torch.from_numpy(dummy).to(self.device, self.dtype)
+        with torch.inference_mode(), torch.jit.optimized_execution(True):
+            for _ in range(self.WARMUP_ITERATIONS):
+                self.model(dummy)
+
     def update(self, ear, mar, puc, moe):
         """
         Actualiza el estado del clasificador con nuevas métricas.
-        
+
         Args:
             ear (float): Valor de EAR (Eye Aspect Ratio)
             mar (float): Valor de MAR (Mouth Aspect Ratio)
             puc (float): Valor de PUC (Pupil Circularity)
             moe (float): Valor de MOE (Mouth Opening Extent)
-            
+
         Returns:
             int or None: 1 si se detecta fatiga, 0 si no, o None si no hay suficientes muestras
         """
-        self.input_data.append([ear, mar, puc, moe])
-        if len(self.input_data) > 20:
-            self.input_data.pop(0)
-        if len(self.input_data) == 20:
+        self._buffer[self._head] = (ear, mar, puc, moe)
+        self._head = (self._head + 1) % SEQUENCE_LENGTH
+        if self._count < SEQUENCE_LENGTH:
+            self._count += 1
+        if self._count == SEQUENCE_LENGTH:
             return self.classify()
         return None
-    
+
     def classify(self):
         """
         Realiza la clasificación basada en las últimas 20 muestras.
-        
+
         Returns:
             int: 1 si se detecta fatiga, 0 en caso contrario
         """
-        model_input = [
-            self.input_data[:5], self.input_data[3:8],
-            self.input_data[6:11], self.input_data[9:14],
-            self.input_data[12:17], self.input_data[15:]
-        ]
-        with torch.no_grad():
-            preds = torch.sigmoid(self.model(torch.FloatTensor(model_input))).gt(0.7).int()
+        model_input = self._buffer[_RING_WINDOW_IDX[self._head]]  # (6, 5, 4) en orden cronológico
+        if self.use_onnx:
+            logits = self.session.run(None, {self.input_name: model_input})[0]
+            return int(np.count_nonzero(logits > _LOGIT_THRESHOLD) >= 5)
+        with torch.inference_mode():
+            preds = torch.sigmoid(self.model(torch.from_numpy(model_input).to(self.device, self.dtype))).gt(0.7).int()
         return int(preds.sum() >= 5)
-    
+
     def reset(self):
         """Reinicia el buffer de datos del clasificador."""
-        self.input_data = []
+        self._head = 0
+        self._count = 0
@@ -389,8 +389,12 @@ def smartphone_exposure_balance(frame, gamma_val):
         logger.warning(f"Error en el procesamiento de color para balance de exposición: {e}")
         return frame
 
-def adjust_exposure(frame, cap, config):
-    """Ajusta la exposición de la cámara basándose en la luminosidad del ROI."""
+def adjust_exposure(frame, cap, config, mirrored_roi=False):
+    """
+    Ajusta la exposición de la cámara basándose en la luminosidad del ROI.
+    Con mirrored_roi=True el ROI está en coordenadas de la vista en espejo (donde lo dibuja
+    y lo selecciona el usuario) y se refleja horizontalmente para medir sobre el frame original.
+    """
     global error_integral, last_error, last_adjustment
 
     if not config.get('roi_autoexposure_settings', {}).get('ROI_ENABLED', False) or not roi_selected or roi is None:
@@ -398,6 +402,8 @@ def adjust_exposure(frame, cap, config):
 
     try:
         x, y, w, h = roi
+        if mirrored_roi:
+            x = frame.shape[1] - x - w
         roi_frame = frame[y:y+h, x:x+w]
 
         if roi_frame.size == 0:
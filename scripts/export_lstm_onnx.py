@@ -0,0 +1,33 @@
+# scripts/export_lstm_onnx.py
+"""
+Exporta el modelo LSTM TorchScript a ONNX para ejecutarlo con ONNX Runtime en CPU.
+
+Uso:
+    python scripts/export_lstm_onnx.py [models/D.pth] [models/D.onnx]
+
+Después basta con apuntar 'lstm_model_path' de la configuración al fichero .onnx.
+"""
+
+import sys
+import torch
+
+# Forma de entrada de LSTMClassifier.classify: 6 ventanas de 5 muestras x 4 métricas
+NUM_WINDOWS, WINDOW_SIZE, NUM_FEATURES = 6, 5, 4
+
+
+def export(src_path: str = "models/D.pth", dst_path: str = "models/D.onnx") -> None:
+    model = torch.jit.load(src_path, map_location="cpu")
+    model.eval()
+    dummy = torch.zeros(NUM_WINDOWS, WINDOW_SIZE, NUM_FEATURES)
+    torch.onnx.export(
+        model, dummy, dst_path,
+        opset_version=17,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {0: "windows"}, "output": {0: "windows"}},
+    )
+    print(f"Modelo exportado a {dst_path}")
+
+
+if __name__ == "__main__":
+    export(*sys.argv[1:3])